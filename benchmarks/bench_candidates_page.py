@@ -0,0 +1,89 @@
+"""
+Benchmark of GET /candidates/ pages of 500 candidates with special scores, the handler returning
+the page model through FastAPI's `response_model` validation and serialization against returning
+it as an `ORJSONModelResponse`. Runs the real handler on a throwaway database with special scores
+served from memory, from the repository root:
+
+    python -m benchmarks.bench_candidates_page [requests]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import takehome.app
+import takehome.utils
+from takehome.app import app
+from takehome.authy import get_current_user
+from takehome.repository.database import Base, get_session
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB, SkillDB
+from takehome.responses import ORJSONModelResponse
+
+PAGE_SIZE = 500
+SKILLS_PER_ROW = 5
+
+
+def populate(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(SkillDB.__table__.insert(), [{"id": i, "name": f"skill {i}"} for i in range(1, 21)])
+        connection.execute(CandidateDB.__table__.insert(), [{"id": i, "name": f"candidate {i}"}
+                                                            for i in range(1, PAGE_SIZE + 1)])
+        connection.execute(CandidateSkillDB.__table__.insert(), [
+            {"candidate_id": i, "skill_id": (i + j) % 20 + 1, "expertise_level": j + 1}
+            for i in range(1, PAGE_SIZE + 1) for j in range(SKILLS_PER_ROW)])
+    engine.dispose()
+
+
+def cached_special_score(payload: dict, refresh: bool = False) -> dict:
+    return {skill['skill']: skill['score'] * 1.25 for skill in payload['skills']}
+
+
+async def measure(client: AsyncClient, requests: int) -> float:
+    """
+    Mean seconds per page
+    """
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.get("/candidates/", params={"size": PAGE_SIZE})
+        assert response.status_code == 200 and len(response.json()["candidates"]) == PAGE_SIZE
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        populate(path)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def bench_session():
+            async with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_session] = bench_session
+        app.dependency_overrides[get_current_user] = lambda: None
+        takehome.utils.fetch_special_score = cached_special_score
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+            # the handler returns the model itself, as it did before, for the response_model path
+            takehome.app.ORJSONModelResponse = lambda model: model
+            await measure(client, 3)
+            model_time = await measure(client, requests)
+            takehome.app.ORJSONModelResponse = ORJSONModelResponse
+            await measure(client, 3)
+            fast_time = await measure(client, requests)
+        await engine.dispose()
+
+    print(f"GET /candidates/?size={PAGE_SIZE}  response_model {model_time * 1e3:7.1f} ms   "
+          f"ORJSONModelResponse {fast_time * 1e3:7.1f} ms   speedup {model_time / fast_time:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
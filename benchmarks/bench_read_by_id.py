@@ -0,0 +1,88 @@
+"""
+Micro-benchmark of the single row reads of GET /candidate/ and GET /project/, the orm path
+(joinedload into identity mapped objects, copied into the response models) against the Core path
+(`read_candidate` / `read_project`). Runs on a throwaway database, from the repository root:
+
+    python -m benchmarks.bench_read_by_id [iterations]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from takehome.models import Candidate, Project, Skill
+from takehome.repository.database import Base
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB, ProjectDB, ProjectSkillDB, SkillDB
+from takehome.repository.database_utils import get_candidate_by_id, get_project_by_id, read_candidate, read_project
+
+ROWS = 1000
+SKILLS_PER_ROW = 5
+
+
+def populate(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(SkillDB.__table__.insert(), [{"id": i, "name": f"skill {i}"} for i in range(1, 21)])
+        connection.execute(CandidateDB.__table__.insert(), [{"id": i, "name": f"candidate {i}"} for i in range(1, ROWS + 1)])
+        connection.execute(ProjectDB.__table__.insert(), [{"id": i, "title": f"project {i}"} for i in range(1, ROWS + 1)])
+        connection.execute(CandidateSkillDB.__table__.insert(), [
+            {"candidate_id": i, "skill_id": (i + j) % 20 + 1, "expertise_level": j + 1}
+            for i in range(1, ROWS + 1) for j in range(SKILLS_PER_ROW)])
+        connection.execute(ProjectSkillDB.__table__.insert(), [
+            {"project_id": i, "skill_id": (i + j) % 20 + 1, "expertise_level": j + 1}
+            for i in range(1, ROWS + 1) for j in range(SKILLS_PER_ROW)])
+    engine.dispose()
+
+
+async def orm_candidate(db, id: int) -> Candidate:
+    candidate = await get_candidate_by_id(db, id)
+    return Candidate(id=candidate.id, name=candidate.name,
+                     skills=[Skill(name=skill.name, expertise_level=skill.expertise_level) for skill in candidate.skills])
+
+async def orm_project(db, id: int) -> Project:
+    project = await get_project_by_id(db, id)
+    return Project(id=project.id, title=project.title,
+                   skills=[Skill(name=skill.name, expertise_level=skill.expertise_level) for skill in project.skills])
+
+
+async def measure(session_factory, read, iterations: int) -> float:
+    """
+    Mean seconds per read, every read gets its own session like a request does
+    """
+    start = time.perf_counter()
+    for i in range(iterations):
+        async with session_factory() as db:
+            await read(db, i % ROWS + 1)
+    return (time.perf_counter() - start) / iterations
+
+
+async def main(iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        populate(path)
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        async with session_factory() as db:
+            assert await orm_candidate(db, 7) == await read_candidate(db, 7)
+            assert await orm_project(db, 7) == await read_project(db, 7)
+
+        for label, orm_read, core_read in [("candidate", orm_candidate, read_candidate),
+                                           ("project", orm_project, read_project)]:
+            # warm up the statement caches of both paths
+            await measure(session_factory, orm_read, 200)
+            await measure(session_factory, core_read, 200)
+            orm_time = await measure(session_factory, orm_read, iterations)
+            core_time = await measure(session_factory, core_read, iterations)
+            print(f"{label:<10} orm {orm_time * 1e6:8.1f} us   core {core_time * 1e6:8.1f} us   "
+                  f"speedup {orm_time / core_time:.2f}x")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
@@ -9,3 +9,11 @@ def dev():
 def mock():
     """Start the mock server with `poetry run start` at root level."""
     uvicorn.run("takehome.mock:app", host="0.0.0.0", port=8001, reload=True, reload_includes=["takehome/mock.py"], reload_excludes=["*.py"])
+
+
+def rescore():
+    """Re-score all candidates and rebuild the special score cache with `poetry run rescore` at root level."""
+    from takehome.score_worker import rescore_all_candidates, score_warmer
+
+    rescore_all_candidates()
+    score_warmer.stop()
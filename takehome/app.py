@@ -1,27 +1,45 @@
 """
 Entry point of application and API calls
 """
+import asyncio
+import logging
 from pathlib import Path
 from starlette.requests import Request
-from starlette.responses import HTMLResponse
+from starlette.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from fastapi import FastAPI,  HTTPException, status, Depends
-from typing import Optional
+from fastapi import FastAPI,  HTTPException, status, Depends, Query, Header
+from typing import List, Optional
 from datetime import timedelta
 from fastapi.security import OAuth2PasswordRequestForm
 
 from takehome.config import settings
-from takehome.repository.database import engine, Base
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.repository.database import engine, Base, get_session, get_db
+from takehome.repository.migrations import run_migrations
+from takehome.repository.filters import SkillFilter, parse_skill_filter, merge_skill_filters
+from takehome.repository.search import RELEVANCE
 from takehome.models import Project, Candidate, ProjectCreateRequest, CandidateCreateRequest, FormTeamRequest
-from takehome.models import FormTeamResponse, CandidateResponse, SkillResponse, Skill, ProjectListResponse, CandidateListResponse
-from takehome.models import Token
+from takehome.models import FormTeamResponse, CandidateResponse, ProjectListResponse, CandidateListResponse
+from takehome.models import Token, BulkImportResponse, SkillsPatchRequest, SkillsPatchResponse
 from takehome.repository.database_utils import create_project_db, get_project_by_id, delete_project_db, update_project_db
-from takehome.repository.database_utils import get_candidate_by_id, delete_candidate_db, update_candidate_db, create_candidate_db
-from takehome.repository.database_utils import get_project_list, get_candidate_list
-from takehome.utils import form_team_helper, fetch_special_score, fetch_parallel_scores
-from takehome.cache import redis_client
-from takehome.constants import SPECIAL_SCORE_REDIS_KEY
-from takehome.authy import create_access_token, authenticate_user, get_current_user
+from takehome.repository.database_utils import read_project, get_row_version, get_collection_version
+from takehome.repository.database_models import CandidateDB, ProjectDB
+from takehome.repository.database_utils import read_candidate, delete_candidate_db, update_candidate_db, create_candidate_db
+from takehome.repository.database_utils import get_project_list, get_candidate_list, get_candidates_by_ids
+from takehome.repository.database_utils import bulk_create_projects_db, bulk_create_candidates_db
+from takehome.repository.database_utils import patch_project_skills_db, patch_candidate_skills_db
+from takehome.bulk_import import run_import
+from takehome.utils import form_team_helper, submit_special_score, fetch_parallel_scores, build_special_score_payload
+from takehome.utils import fetch_scores_with_deadline, build_candidate_response, export_candidates_ndjson
+from takehome.score_worker import score_warmer
+from takehome.scorer import ScorerUnavailableError
+from takehome.constants import MAX_BATCH_SIZE, MAX_SKILL_FILTERS
+from takehome.cache import score_cache
+from takehome.candidate_store import candidate_store
+from takehome.responses import ORJSONModelResponse, row_etag, collection_etag, etag_matches, not_modified
+from takehome.authy import create_access_token, authenticate_user, get_current_user, login_throttle, password_executor
+from takehome.authy import get_user_for_login
 from takehome.logs import LoggingContext, LOGGER
 
 # ============================ Team Matcher Server ============================
@@ -45,8 +63,51 @@ templates = Jinja2Templates(directory=Path(BASE_DIR, "templates"))
 @app.on_event("startup")
 def startup_event():
     LOGGER.info("On startup_event")
-    redis_client.flushdb()
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    if settings.CANDIDATE_STORE_ENABLED:
+        with get_db() as db:
+            candidate_store.load(db)
+    score_cache.start_invalidation_listener()
+    score_warmer.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    LOGGER.info("On shutdown_event")
+    score_cache.stop_invalidation_listener()
+    score_warmer.stop()
+
+
+@app.exception_handler(ScorerUnavailableError)
+def scorer_unavailable_handler(request: Request, exc: ScorerUnavailableError):
+    LOGGER.error("Special score service unavailable: %s", exc)
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Special score service unavailable, please retry later"},
+    )
+
+
+def validate_deadline(deadline_ms: Optional[int]) -> None:
+    if deadline_ms is not None and deadline_ms < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, deadline_ms must be greater than 0",
+        )
+
+
+def build_skill_filters(skill_required: Optional[str], skills: Optional[List[str]]) -> List[SkillFilter]:
+    filters = [SkillFilter(skill_required, None, None)] if skill_required else []
+    filters.extend(parse_skill_filter(value) for value in skills or [])
+    if len(filters) > MAX_SKILL_FILTERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Request, at most {MAX_SKILL_FILTERS} skill filters can be used at once",
+        )
+    return merge_skill_filters(filters)
+
+SKILLS_QUERY = Query(None, description='Skill predicates, all have to match, e.g. skills=Python:7&skills=SQL:5-8 '
+                                       'for Python at level 7 or above and SQL between 5 and 8')
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -58,147 +119,151 @@ def root(request: Request):
     )
 
 @app.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+    # only known usernames are counted, attempts with made up usernames cannot push a real one out of the throttle
+    retry_after = login_throttle.start_attempt(form_data.username) if get_user_for_login(form_data.username) else None
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed logins, try again later",
+            headers={"Retry-After": str(retry_after)},
+        )
+    user = await asyncio.wrap_future(password_executor.submit(authenticate_user, form_data.username, form_data.password))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    login_throttle.reset(form_data.username)
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
 
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/project/", response_model=Project)
-def get_project(id: int, user=Depends(get_current_user)):
+async def get_project(id: int, if_none_match: Optional[str] = Header(None), db: AsyncSession = Depends(get_session),
+                      user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="get_project", project_id=id)
     LOGGER.info("Request received", extra=local_logging_context.store)
-    
-    project_db = get_project_by_id(id)
-    if not project_db:
+
+    if if_none_match:
+        version = await get_row_version(db, ProjectDB, id)
+        if version is not None and etag_matches(if_none_match, row_etag("project", id, version)):
+            return not_modified(row_etag("project", id, version))
+
+    project = await read_project(db, id)
+    if not project:
         LOGGER.warn("Invalid Request, Project with provided id does not exists", extra=local_logging_context.store)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, Project with provided id does not exists",
         )
-    
-    skill_response = []
-    for skill in project_db.skills:
-        skill_tmp = Skill(name=skill.name, expertise_level=skill.expertise_level)
-        skill_response.append(skill_tmp)
 
-    project_response = Project(id=project_db.id, title=project_db.title, skills=skill_response)
+    project_response, version = project
     LOGGER.debug("Request successfully completed ", extra=local_logging_context.store)
-    return project_response
+    return ORJSONModelResponse(project_response, headers={"ETag": row_etag("project", id, version)})
 
 @app.post("/project/", response_model=Project)
-def create_project(project: ProjectCreateRequest, user=Depends(get_current_user)):
+async def create_project(project: ProjectCreateRequest, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="create_project")
-    LOGGER.debug(f"Request received with input as {project.dict()}", extra=local_logging_context.store)
-    new_project = create_project_db(project, local_logging_context)
+    LOGGER.debug("Request received with input as %s", project, extra=local_logging_context.store)
+    new_project = await create_project_db(db, project, local_logging_context)
     return new_project
 
 @app.delete("/project/")
-def delete_project(id: int, user=Depends(get_current_user)):
+async def delete_project(id: int, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="delete_project", project_id=id)
     LOGGER.debug("Request received", extra=local_logging_context.store)
-    delete_project_db(id)
+    await delete_project_db(db, id)
     LOGGER.debug("Request successfully completed", extra=local_logging_context.store)
     return {"message": "success"}
 
 @app.put("/project/", response_model=Project)
-def update_project(project: Project, user=Depends(get_current_user)):
+async def update_project(project: Project, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="update_project", project_id=project.id)
-    LOGGER.debug(f"Request received with input as {project.dict()}", extra=local_logging_context.store)
-    updated_project = update_project_db(project)
+    LOGGER.debug("Request received with input as %s", project, extra=local_logging_context.store)
+    updated_project = await update_project_db(db, project)
     LOGGER.debug("Request successfully completed", extra=local_logging_context.store)
     return updated_project
 
 @app.get("/candidate/", response_model=CandidateResponse)
-def get_candidate(id: int, user=Depends(get_current_user)):
+async def get_candidate(id: int, deadline_ms: Optional[int] = None, if_none_match: Optional[str] = Header(None),
+                        db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="get_candidate", candidate_id=id)
     LOGGER.info("Request received", extra=local_logging_context.store)
-    candidate_db = get_candidate_by_id(id)
-    if not candidate_db:
+    validate_deadline(deadline_ms)
+
+    # special scores are a function of the skills, an unchanged candidate needs no scorer call
+    if if_none_match:
+        version = await get_row_version(db, CandidateDB, id)
+        if version is not None and etag_matches(if_none_match, row_etag("candidate", id, version)):
+            return not_modified(row_etag("candidate", id, version))
+
+    candidate = await read_candidate(db, id)
+    if not candidate:
         LOGGER.warn("Invalid Request, Candidate with provided id does not exists", extra=local_logging_context.store)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, Candidate with provided id does not exists",
         )
-    
-    payload = {'candidate_id': str(candidate_db.id)}
-    payload['skills'] = [{'skill': skill.name, 'score': skill.expertise_level}  for skill in candidate_db.skills]
-    special_score = fetch_special_score(payload)
 
-    local_logging_context.upsert(special_score_payload=payload)
-    LOGGER.debug("Fetching special score", extra=local_logging_context.store)
-    local_logging_context.remove_keys(["special_score_payload"])
+    candidate, version = candidate
+    payload = build_special_score_payload(candidate)
+    if deadline_ms is None:
+        special_score = await submit_special_score(payload)
+    else:
+        special_score = (await fetch_scores_with_deadline([payload], deadline_ms / 1000))[payload['candidate_id']]
 
-    skill_response = []
-    for skill in candidate_db.skills:
-        skill_tmp = SkillResponse(name=skill.name, expertise_level=skill.expertise_level, special_score=special_score[skill.name])
-        skill_response.append(skill_tmp)
+    if LOGGER.isEnabledFor(logging.DEBUG):
+        LOGGER.debug("Fetching special score", extra=dict(local_logging_context.store, special_score_payload=payload))
 
-    candidate_response = CandidateResponse(id=candidate_db.id, name=candidate_db.name, skills=skill_response)
+    candidate_response = build_candidate_response(candidate, special_score)
     LOGGER.debug("Request successfully completed ", extra=local_logging_context.store)
-    return candidate_response
+    # a response with pending scores is not cached, the next poll has to fetch the scores
+    headers = {"ETag": row_etag("candidate", id, version)} if special_score is not None else None
+    return ORJSONModelResponse(candidate_response, headers=headers)
 
 @app.post("/candidate/", response_model=Candidate)
-def create_candidate(candidate: CandidateCreateRequest, user=Depends(get_current_user)):
+async def create_candidate(candidate: CandidateCreateRequest, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="create_candidate")
-    LOGGER.debug(f"Request received with input as {candidate.dict()}", extra=local_logging_context.store)
-    new_candidate = create_candidate_db(candidate, local_logging_context)
-    #deleting cached special scores
-    redis_client.delete(SPECIAL_SCORE_REDIS_KEY.format(new_candidate.id))
+    LOGGER.debug("Request received with input as %s", candidate, extra=local_logging_context.store)
+    new_candidate = await create_candidate_db(db, candidate, local_logging_context)
+    #pre-warming special scores so the first read does not wait on the scorer
+    score_warmer.enqueue(build_special_score_payload(new_candidate))
     return new_candidate
 
 @app.delete("/candidate/")
-def delete_candidate(id: int, user=Depends(get_current_user)):
+async def delete_candidate(id: int, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="delete_candidate", candidate_id=id)
     LOGGER.debug("Request received", extra=local_logging_context.store)
-    delete_candidate_db(id)
-
-    #deleting cached special scores
-    redis_client.delete(SPECIAL_SCORE_REDIS_KEY.format(id))
+    await delete_candidate_db(db, id)
     LOGGER.debug("Request succesfully completed", extra=local_logging_context.store)
     return {"message": "success"}
 
 @app.put("/candidate/", response_model=Candidate)
-def update_candidate(candidate: Candidate, user=Depends(get_current_user)):
+async def update_candidate(candidate: Candidate, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="update_candidate", candidate_id=candidate.id)
-    LOGGER.debug(f"Request received with input as {candidate.dict()}", extra=local_logging_context.store)
-    updated_candidate = update_candidate_db(candidate)
-
-    #deleting cached special score
-    redis_client.delete(SPECIAL_SCORE_REDIS_KEY.format(candidate.id))
+    LOGGER.debug("Request received with input as %s", candidate, extra=local_logging_context.store)
+    updated_candidate = await update_candidate_db(db, candidate)
+    score_warmer.enqueue(build_special_score_payload(updated_candidate))
     candidate_response = Candidate(id=updated_candidate.id, name=updated_candidate.name, skills=updated_candidate.skills)
     LOGGER.debug("Request succesfully completed", extra=local_logging_context.store)
     return candidate_response
 
 @app.post('/api/form-team', response_model=FormTeamResponse)
-def form_team(request_model: FormTeamRequest, user=Depends(get_current_user)):
+async def form_team(request_model: FormTeamRequest, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
     local_logging_context: LoggingContext = LoggingContext(source="form_team", request_model = request_model)
     LOGGER.debug("Request received", extra=local_logging_context.store)
-    project = get_project_by_id(request_model.project_id)
+    project = await get_project_by_id(db, request_model.project_id)
     if not project:
-        LOGGER.warn(f"Invalid Request, Project with provided {request_model.project_id} does not exists", extra=local_logging_context.store)
+        LOGGER.warn("Invalid Request, Project with provided %s does not exists", request_model.project_id, extra=local_logging_context.store)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, Project with provided id does not exists",
         )
     
-    candidates = []
-    for candidate_id in request_model.candidate_ids:
-        candidate = get_candidate_by_id(candidate_id)
-        LOGGER.warn(f"Invalid Request, Candidate with id {candidate_id} does not exists", extra=local_logging_context.store)
-        if not candidate:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid Request, Candidate with id {} does not exists".format(candidate_id),
-            )
-        candidates.append(candidate)
+    candidates = await get_candidates_by_ids(db, request_model.candidate_ids)
 
     if request_model.team_size > len(candidates):
         LOGGER.warn("Invalid Request, team_size cannot be greater than candidate list", extra=local_logging_context.store)
@@ -207,21 +272,105 @@ def form_team(request_model: FormTeamRequest, user=Depends(get_current_user)):
             detail="Invalid Request, team_size cannot be greater than candidate list",
         )
     
-    optimal_team = form_team_helper(request_model.team_size, candidates, project, local_logging_context)
+    optimal_team = await form_team_helper(request_model.team_size, candidates, project, local_logging_context)
     LOGGER.debug("Request succesfully completed", extra=local_logging_context.store)
-    return optimal_team
+    return ORJSONModelResponse(optimal_team)
+
+@app.post("/projects/import", response_model=BulkImportResponse)
+async def import_projects(request: Request, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+    """
+    Imports projects from an NDJSON body, or a CSV body (text/csv) with title and skills columns
+    where skills are formatted as "Python:7;SQL:5"
+    """
+    local_logging_context: LoggingContext = LoggingContext(source="import_projects")
+    LOGGER.debug("Request received", extra=local_logging_context.store)
+    return await run_import(request.stream(), request.headers.get("content-type", ""), db,
+                            ProjectCreateRequest, "title", bulk_create_projects_db, settings.IMPORT_CHUNK_SIZE)
+
+@app.post("/candidates/import", response_model=BulkImportResponse)
+async def import_candidates(request: Request, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+    """
+    Imports candidates from an NDJSON body, or a CSV body (text/csv) with name and skills columns
+    where skills are formatted as "Python:7;SQL:5"
+    """
+    local_logging_context: LoggingContext = LoggingContext(source="import_candidates")
+    LOGGER.debug("Request received", extra=local_logging_context.store)
+    return await run_import(request.stream(), request.headers.get("content-type", ""), db,
+                            CandidateCreateRequest, "name", bulk_create_candidates_db, settings.IMPORT_CHUNK_SIZE)
+
+@app.patch("/projects/skills", response_model=SkillsPatchResponse)
+async def patch_projects_skills(request_model: SkillsPatchRequest, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+    local_logging_context: LoggingContext = LoggingContext(source="patch_projects_skills")
+    LOGGER.debug("Request received", extra=local_logging_context.store)
+    updated = await patch_project_skills_db(db, request_model.items)
+    LOGGER.debug("Request successfully completed", extra=local_logging_context.store)
+    return SkillsPatchResponse(updated=updated)
+
+@app.patch("/candidates/skills", response_model=SkillsPatchResponse)
+async def patch_candidates_skills(request_model: SkillsPatchRequest, db: AsyncSession = Depends(get_session), user=Depends(get_current_user)):
+    local_logging_context: LoggingContext = LoggingContext(source="patch_candidates_skills")
+    LOGGER.debug("Request received", extra=local_logging_context.store)
+    candidates_db = await patch_candidate_skills_db(db, request_model.items)
+    for candidate in candidates_db:
+        score_warmer.enqueue(build_special_score_payload(candidate))
+    LOGGER.debug("Request successfully completed", extra=local_logging_context.store)
+    return SkillsPatchResponse(updated=len(candidates_db))
+
+@app.get("/candidates/batch", response_model=CandidateListResponse)
+async def get_candidates_batch(ids: List[int] = Query(...), deadline_ms: Optional[int] = None,
+    db: AsyncSession = Depends(get_session),
+    user=Depends(get_current_user)
+    ):
+    local_logging_context: LoggingContext = LoggingContext(source="get_candidates_batch", candidate_ids=ids)
+    LOGGER.debug("Request received ", extra=local_logging_context.store)
+    if len(ids) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Request, at most {MAX_BATCH_SIZE} ids can be requested at once",
+        )
+    validate_deadline(deadline_ms)
+
+    candidates_db = await get_candidates_by_ids(db, ids)
+
+    payloads = [build_special_score_payload(candidate) for candidate in candidates_db]
+    if deadline_ms is None:
+        special_scores = await fetch_parallel_scores(payloads)
+    else:
+        special_scores = await fetch_scores_with_deadline(payloads, deadline_ms / 1000)
+
+    candidate_responses = [build_candidate_response(candidate, special_scores[str(candidate.id)])
+                           for candidate in candidates_db]
+    LOGGER.debug("Request successfully completed ", extra=local_logging_context.store)
+    return ORJSONModelResponse(CandidateListResponse(size=len(candidate_responses), candidates=candidate_responses))
+
+@app.get("/candidates/export", response_class=StreamingResponse,
+         responses={200: {"content": {"application/x-ndjson": {}}, "description": "One CandidateResponse per line"}})
+async def export_candidates(user=Depends(get_current_user)):
+    local_logging_context: LoggingContext = LoggingContext(source="export_candidates")
+    LOGGER.debug("Request received ", extra=local_logging_context.store)
+    # lines are written batch by batch as their scores are ready, the table is never held in memory
+    return StreamingResponse(export_candidates_ndjson(), media_type="application/x-ndjson")
 
 @app.get("/projects/", response_model=ProjectListResponse)
-def get_projects(page_no: int, size: int, title: Optional[str] = None,
+async def get_projects(request: Request, size: int, page_no: Optional[int] = None, cursor: Optional[str] = None,
+    title: Optional[str] = None,
     skill_required: Optional[str] = None,
+    skills: Optional[List[str]] = SKILLS_QUERY,
     sort_by: Optional[str] = "id",
     order: Optional[str] = "asc",
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_session),
     user=Depends(get_current_user)
     ):
     local_logging_context: LoggingContext = LoggingContext(source="get_projects")
     LOGGER.debug("Request received ", extra=local_logging_context.store)
     # Validate pagination parameters
-    if page_no < 1:
+    if page_no is not None and cursor is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, use either page_no or cursor",
+        )
+    if page_no is not None and page_no < 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, page_no must be greater than 0",
@@ -232,10 +381,15 @@ def get_projects(page_no: int, size: int, title: Optional[str] = None,
             detail="Invalid Request, size must be greater than 0",
         )
 
-    if sort_by not in ["id", "title"]:
+    if sort_by not in ["id", "title", RELEVANCE]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, possible values of sort_by are id, title, relevance",
+        )
+    if sort_by == RELEVANCE and not title:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid Request, possible values of sort_by are id, title",
+            detail="Invalid Request, sort_by relevance requires title",
         )
     
     if order not in ["asc", "desc"]:
@@ -243,24 +397,42 @@ def get_projects(page_no: int, size: int, title: Optional[str] = None,
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, possible values of order are asc, desc",
         )
+    skill_filters = build_skill_filters(skill_required, skills)
+
+    # Calculate the skip value based on page_no and size, cursors are preferred as they
+    # do not get slower on deep pages
+    skip = (page_no - 1) * size if page_no else 0
 
-    # Calculate the skip value based on page_no and size
-    skip = (page_no - 1) * size
+    # read before the page, a write in between makes the next poll fetch again instead of missing it
+    etag = collection_etag("projects", await get_collection_version(db, ProjectDB), request.query_params)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
 
-    return get_project_list(skip, size, title, skill_required, sort_by, order)
+    project_list = await get_project_list(db, skip, size, title, skill_filters, sort_by, order, cursor)
+    return ORJSONModelResponse(project_list, headers={"ETag": etag})
 
 @app.get("/candidates/", response_model=CandidateListResponse)
-def get_candidates(page_no: int, size: int, name: Optional[str] = None,
+async def get_candidates(request: Request, size: int, page_no: Optional[int] = None, cursor: Optional[str] = None,
+    name: Optional[str] = None,
     skill_required: Optional[str] = None,
+    skills: Optional[List[str]] = SKILLS_QUERY,
     sort_by: Optional[str] = "id",
     order: Optional[str] = "asc",
+    deadline_ms: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_session),
     user=Depends(get_current_user) 
     ):
     local_logging_context: LoggingContext = LoggingContext(source="get_candidates")
     LOGGER.debug("Request received ", extra=local_logging_context.store)
 
     # Validate pagination parameters
-    if page_no < 1:
+    if page_no is not None and cursor is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, use either page_no or cursor",
+        )
+    if page_no is not None and page_no < 1:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, page_no must be greater than 0",
@@ -271,10 +443,15 @@ def get_candidates(page_no: int, size: int, name: Optional[str] = None,
             detail="Invalid Request, size must be greater than 0",
         )
 
-    if sort_by not in ["id", "name"]:
+    if sort_by not in ["id", "name", RELEVANCE]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, possible values of sort_by are id, name, relevance",
+        )
+    if sort_by == RELEVANCE and not name:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid Request, possible values of sort_by are id, name",
+            detail="Invalid Request, sort_by relevance requires name",
         )
     
     if order not in ["asc", "desc"]:
@@ -282,28 +459,33 @@ def get_candidates(page_no: int, size: int, name: Optional[str] = None,
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, possible values of order are asc, desc",
         )
-
-    # Calculate the skip value based on page_no and size
-    skip = (page_no - 1) * size
-
-    candidates_db = get_candidate_list(skip, size, name, skill_required, sort_by, order)
-
-    payloads = []
-    for candidate in candidates_db:
-        payload = {'candidate_id': str(candidate.id)}
-        payload['skills'] = [{'skill': skill.name, 'score': skill.expertise_level} for skill in candidate.skills]
-        payloads.append(payload)
-    
-    special_scores = fetch_parallel_scores(payloads)
-
-    candidate_responses = []
-    for candidate in candidates_db:
-        special_score = special_scores[str(candidate.id)]
-        skill_response = []
-        for skill in candidate.skills:
-            skill_tmp = SkillResponse(name=skill.name, expertise_level=skill.expertise_level, special_score=special_score[skill.name])
-            skill_response.append(skill_tmp)
-        candidate_tmp = CandidateResponse(id=candidate.id, name=candidate.name, skills=skill_response)
-        candidate_responses.append(candidate_tmp)
-    
-    return CandidateListResponse(size=len(candidate_responses), candidates=candidate_responses)
\ No newline at end of file
+    validate_deadline(deadline_ms)
+    skill_filters = build_skill_filters(skill_required, skills)
+
+    # Calculate the skip value based on page_no and size, cursors are preferred as they
+    # do not get slower on deep pages
+    skip = (page_no - 1) * size if page_no else 0
+
+    # read before the page, a write in between makes the next poll fetch again instead of missing it
+    etag = collection_etag("candidates", await get_collection_version(db, CandidateDB), request.query_params)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+
+    candidates_db, total, next_cursor, prev_cursor = await get_candidate_list(db, skip, size, name, skill_filters,
+                                                                              sort_by, order, cursor)
+
+    payloads = [build_special_score_payload(candidate) for candidate in candidates_db]
+    if deadline_ms is None:
+        special_scores = await fetch_parallel_scores(payloads)
+    else:
+        special_scores = await fetch_scores_with_deadline(payloads, deadline_ms / 1000)
+
+    candidate_responses = [build_candidate_response(candidate, special_scores[str(candidate.id)])
+                           for candidate in candidates_db]
+
+    # a page with pending scores is not cached, the next poll has to fetch the scores
+    headers = {"ETag": etag} if None not in special_scores.values() else None
+    # built from validated models, returned as is instead of being validated again against the response_model
+    return ORJSONModelResponse(CandidateListResponse(size=len(candidate_responses), total=total,
+                                                     candidates=candidate_responses,
+                                                     next_cursor=next_cursor, prev_cursor=prev_cursor), headers=headers)
\ No newline at end of file
@@ -1,4 +1,9 @@
 import jwt
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from jwt import PyJWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -7,11 +12,18 @@ from typing import Optional
 from passlib.context import CryptContext
 
 from takehome.config import settings
+from takehome.cache import InMemoryCache
 from takehome.models import User, UserDetials
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+#bcrypt is slow on purpose, logins wait on this small pool instead of taking the threads of other requests
+password_executor = ThreadPoolExecutor(max_workers=settings.AUTH_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+#username of every verified token keyed by the sha256 of the token, an entry never outlives the token
+verified_tokens = InMemoryCache(max_size=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL_SECONDS)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -32,6 +44,60 @@ def authenticate_user(username: str, password: str):
     return user
 
 
+class LoginThrottle:
+    """
+    Counts login attempts per username in fixed windows, a throttled username is rejected before its
+    password is hashed. An attempt is counted before its password is checked and the count is cleared
+    by a successful login, so concurrent attempts cannot all pass the check while their hashes run.
+    At most `max_usernames` are tracked, the least recently attempted are dropped first.
+    Only used from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, max_failures: int, window_seconds: int, max_usernames: int = 10000):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_usernames = max_usernames
+        # username -> (end of the window, attempts within the window)
+        self._attempts: OrderedDict = OrderedDict()
+
+    def retry_after(self, username: str) -> Optional[int]:
+        """
+        Seconds until `username` may log in again, None when it is not throttled
+        """
+        entry = self._attempts.get(username)
+        if entry is None:
+            return None
+        window_end, attempts = entry
+        now = time.monotonic()
+        if window_end <= now:
+            del self._attempts[username]
+            return None
+        if attempts < self.max_failures:
+            return None
+        return math.ceil(window_end - now)
+
+    def start_attempt(self, username: str) -> Optional[int]:
+        """
+        Counts a login attempt of `username` unless it is throttled,
+        returns the seconds until it may log in again when it is
+        """
+        retry_after = self.retry_after(username)
+        if retry_after is not None:
+            return retry_after
+        now = time.monotonic()
+        window_end, attempts = self._attempts.get(username, (now + self.window_seconds, 0))
+        self._attempts[username] = (window_end, attempts + 1)
+        self._attempts.move_to_end(username)
+        while len(self._attempts) > self.max_usernames:
+            self._attempts.popitem(last=False)
+        return None
+
+    def reset(self, username: str) -> None:
+        self._attempts.pop(username, None)
+
+
+login_throttle = LoginThrottle(settings.LOGIN_MAX_FAILURES, settings.LOGIN_FAILURE_WINDOW_SECONDS)
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -49,7 +115,14 @@ def get_user_details(username: str) -> UserDetials:
     #Add user details which are required for continuous usage
     return UserDetials(username=username)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDetials:
+#async so authenticating a request does not take a threadpool slot, a token seen before
+#is looked up in verified_tokens instead of being decoded and verified again
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDetials:
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+    username = verified_tokens.get(token_key)
+    if username is not None:
+        return get_user_details(username.decode())
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -62,4 +135,8 @@ def get_current_user(token: str = Depends(oauth2_scheme)) -> UserDetials:
             raise credentials_exception
     except PyJWTError:
         raise credentials_exception
+    # tokens without an expiry are verified every time
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        verified_tokens.set(token_key, username, ex=expires_in)
     return get_user_details(username)
\ No newline at end of file
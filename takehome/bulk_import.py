@@ -0,0 +1,188 @@
+"""
+Incremental parsing and validation of NDJSON and CSV import streams
+"""
+import csv
+from collections import deque
+from typing import AsyncIterator, Callable, List, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from takehome.models import BulkImportError, BulkImportResponse
+from takehome.logs import LOGGER
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+RowOrError = Union[BaseModel, Exception]
+
+
+def import_format(content_type: str) -> str:
+    """
+    text/csv streams are read as CSV, anything else as NDJSON
+    """
+    return CSV if content_type.split(";")[0].strip() == "text/csv" else NDJSON
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Yields (line number, line) as soon as each line has been fully received
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line
+    if buffer:
+        yield line_no + 1, buffer
+
+def parse_skills_field(value: str) -> List[dict]:
+    """
+    Parses the CSV skills column, e.g. "Python:7;SQL:5"
+    """
+    skills = []
+    for item in filter(None, (part.strip() for part in value.split(";"))):
+        name, _, expertise_level = item.rpartition(":")
+        skills.append({"name": name, "expertise_level": expertise_level})
+    return skills
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        messages = []
+        for e in error.errors():
+            location = ".".join(map(str, e["loc"]))
+            messages.append(f"{location}: {e['msg']}" if location else e["msg"])
+        return "; ".join(messages)
+    return str(error)
+
+async def _ndjson_rows(stream: AsyncIterator[bytes], model: Type[BaseModel]) -> AsyncIterator[Tuple[int, RowOrError]]:
+    """
+    Yields (line number, validated row or the error rejecting it) for every non blank line
+    """
+    async for line_no, raw_line in iter_lines(stream):
+        try:
+            line = raw_line.decode().strip()
+            if not line:
+                continue
+            row = model.model_validate_json(line)
+        except (ValueError, ValidationError) as e:
+            row = e
+        yield line_no, row
+
+class _LineFeed:
+    """
+    Source of the CSV reader, lines are appended as they are received and
+    the reader is only advanced once every line of a record is buffered
+    """
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def _csv_rows(stream: AsyncIterator[bytes], model: Type[BaseModel], key_field: str) -> AsyncIterator[Tuple[int, RowOrError]]:
+    """
+    Yields (line number, validated row or the error rejecting it) for every CSV record.
+    A single reader parses the whole stream, so a quoted field may span lines,
+    a record is reported at its first line.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header = None
+    # lines never given to the reader, they are missing from reader.line_num
+    skipped_lines = 0
+    quotes = 0
+    async for _, raw_line in iter_lines(stream):
+        try:
+            line = raw_line.decode()
+        except UnicodeDecodeError as e:
+            # the record being buffered is dropped with the line
+            yield skipped_lines + reader.line_num + 1, e
+            if header is None:
+                return
+            skipped_lines += len(feed.lines) + 1
+            feed.lines.clear()
+            quotes = 0
+            continue
+        feed.lines.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2:
+            # inside a quoted field, the record continues on the next line
+            continue
+        quotes = 0
+
+        while feed.lines:
+            line_no = skipped_lines + reader.line_num + 1
+            try:
+                values = next(reader)
+                if not any(value.strip() for value in values):
+                    continue
+                if header is None:
+                    columns = [column.strip() for column in values]
+                    if key_field not in columns or "skills" not in columns:
+                        raise ValueError(f"CSV header must contain {key_field} and skills columns")
+                    header = columns
+                    continue
+                data = dict(zip(header, values))
+                data["skills"] = parse_skills_field(data.get("skills", ""))
+                row = model.model_validate(data)
+            except (ValueError, ValidationError, csv.Error) as e:
+                row = e
+            yield line_no, row
+            if header is None:
+                # nothing can be parsed without a valid header
+                return
+
+    if feed.lines:
+        yield skipped_lines + reader.line_num + 1, ValueError("unterminated quoted field")
+
+async def run_import(stream: AsyncIterator[bytes], content_type: str, db: AsyncSession, model: Type[BaseModel],
+                     key_field: str, insert_chunk: Callable, chunk_size: int) -> BulkImportResponse:
+    """
+    Validates rows as they arrive and inserts every `chunk_size` valid rows in one transaction.
+    Args:
+        stream: The request body.
+        content_type (str): The request content type, selects NDJSON or CSV parsing.
+        db (AsyncSession): The database session to use.
+        model: The pydantic model every row is validated against.
+        key_field (str): The unique field of the model, name of the CSV column next to `skills`.
+        insert_chunk (Callable): Coroutine inserting a list of (line, row), returns (inserted count, errors).
+        chunk_size (int): The number of rows inserted per transaction.
+    Returns:
+        BulkImportResponse: The number of inserted rows and an error for every rejected row.
+    """
+    if import_format(content_type) == CSV:
+        rows = _csv_rows(stream, model, key_field)
+    else:
+        rows = _ndjson_rows(stream, model)
+    inserted = 0
+    errors: List[BulkImportError] = []
+    chunk = []
+
+    async def flush():
+        nonlocal inserted, chunk
+        chunk_inserted, chunk_errors = await insert_chunk(db, chunk)
+        inserted += chunk_inserted
+        errors.extend(chunk_errors)
+        chunk = []
+
+    async for line_no, row in rows:
+        if isinstance(row, Exception):
+            errors.append(BulkImportError(line=line_no, error=_error_message(row)))
+            continue
+        chunk.append((line_no, row))
+        if len(chunk) >= chunk_size:
+            await flush()
+
+    if chunk:
+        await flush()
+    LOGGER.info("Bulk import finished with %s inserted and %s failed rows", inserted, len(errors))
+    errors.sort(key=lambda error: error.line)
+    return BulkImportResponse(inserted=inserted, failed=len(errors), errors=errors)
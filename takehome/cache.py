@@ -1,9 +1,20 @@
 """
-Class to return a redis singleton
+Cache backends sharing one interface: in-process LRU, SQLite file and redis (with an in-process L1),
+the backend is selected by `settings.CACHE_BACKEND`
 """
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
 import redis
 
 from takehome.config import settings
+from takehome.constants import CACHE_INVALIDATION_CHANNEL, CACHE_KEY_PREFIX
 from takehome.logs import LOGGER
 
 
@@ -55,4 +66,315 @@ class RedisClient(metaclass=Singleton):
             LOGGER.warn("RedisConnection: connection broken")
             return False
 
-redis_client = RedisClient(settings.REDIS_URL).conn
+
+class CacheBackend(ABC):
+    """
+    Interface implemented by every cache backend. Values are bytes (str values are encoded),
+    `ex` is the expiry of an entry in seconds.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value, ex: Optional[int] = None) -> None:
+        ...
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Returns values in the order of `keys`, None for missing keys
+        """
+        return [self.get(key) for key in keys]
+
+    def set_many(self, mapping: Dict[str, bytes], ex: Optional[int] = None, broadcast: bool = False) -> None:
+        """
+        `broadcast` asks other app instances to evict the keys from their local copy,
+        for values replacing ones other instances may still hold
+        """
+        for key, value in mapping.items():
+            self.set(key, value, ex=ex)
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        """
+        Removes every entry of this cache, and nothing else when the storage is shared
+        """
+
+    def start_invalidation_listener(self) -> None:
+        """
+        Only needed by backends shared between app instances through a local copy
+        """
+
+    def stop_invalidation_listener(self) -> None:
+        pass
+
+
+def _to_bytes(value) -> bytes:
+    return value.encode() if isinstance(value, str) else value
+
+
+class InMemoryCache(CacheBackend):
+    """
+    A bounded, thread safe, in-process LRU cache with a TTL on every entry.
+    Least recently used entries are evicted once `max_size` is reached.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._store: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Returns the cached value or None if key is missing or expired
+        """
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._store[key]
+                return None
+            self._store.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> None:
+        """
+        Stores value for at most `ttl` seconds, or `ex` seconds if that is shorter
+        """
+        ttl = self.ttl if ex is None else min(ex, self.ttl)
+        with self._lock:
+            self._store[key] = (_to_bytes(value), time.monotonic() + ttl)
+            self._store.move_to_end(key)
+            while len(self._store) > self.max_size:
+                self._store.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._store.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._store.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """
+    A cache stored in a local SQLite file, shared by every worker process of a single node.
+    Every thread uses its own connection, expired rows are ignored on read and purged periodically.
+    """
+    PURGE_EVERY_WRITES = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # written by every scorer executor thread
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connection().execute(
+            f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+            [*keys, time.time()],
+        ).fetchall()
+        values = dict(rows)
+        return [values.get(key) for key in keys]
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> None:
+        self.set_many({key: value}, ex=ex)
+
+    def set_many(self, mapping: Dict[str, bytes], ex: Optional[int] = None, broadcast: bool = False) -> None:
+        expires_at = None if ex is None else time.time() + ex
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, _to_bytes(value), expires_at) for key, value in mapping.items()],
+            )
+        with self._writes_lock:
+            self._writes += len(mapping)
+            purge = self._writes >= self.PURGE_EVERY_WRITES
+            if purge:
+                self._writes = 0
+        if purge:
+            connection.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def delete(self, *keys: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN")
+            connection.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache")
+
+
+class RedisCache(CacheBackend):
+    """
+    An in-process `InMemoryCache` (L1) layered over redis (L2).
+    Reads are served from L1 when possible, deletes and broadcast writes are published over redis
+    pub/sub so every other app instance evicts the same keys from its own L1.
+    Keys are stored in redis under `key_prefix`, so the database can be shared with other data.
+    Redis is only connected to on first use.
+    """
+    CLEAR_BATCH_SIZE = 1000
+
+    def __init__(self, redis_url: str, local_cache: InMemoryCache, channel: str, key_prefix: str):
+        self.redis_url = redis_url
+        self.local = local_cache
+        self.channel = channel
+        self.key_prefix = key_prefix
+        self.instance_id = uuid.uuid4().hex
+        self._redis = None
+        self._listener = None
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = RedisClient(self.redis_url).conn
+        return self._redis
+
+    def _key(self, key: str) -> str:
+        return self.key_prefix + key
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value = self.redis.get(self._key(key))
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> None:
+        value = _to_bytes(value)
+        self.redis.set(self._key(key), value, ex=ex)
+        self.local.set(key, value, ex=ex)
+
+    def get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Returns values in the order of `keys`, L1 misses are fetched from redis in one round trip
+        """
+        values = [self.local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        if not missing:
+            return values
+        redis_values = self.redis.mget([self._key(keys[index]) for index in missing])
+        for index, value in zip(missing, redis_values):
+            if value is not None:
+                self.local.set(keys[index], value)
+                values[index] = value
+        return values
+
+    def set_many(self, mapping: Dict[str, bytes], ex: Optional[int] = None, broadcast: bool = False) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+        for key, value in mapping.items():
+            value = _to_bytes(value)
+            pipeline.set(self._key(key), value, ex=ex)
+            self.local.set(key, value, ex=ex)
+        pipeline.execute()
+        if broadcast:
+            self._publish_invalidation(list(mapping))
+
+    def delete(self, *keys: str) -> None:
+        """
+        Deletes keys from both tiers and asks other instances to evict them from their L1
+        """
+        self.local.delete(*keys)
+        self.redis.delete(*(self._key(key) for key in keys))
+        self._publish_invalidation(list(keys))
+
+    def _publish_invalidation(self, keys: List[str]) -> None:
+        message = json.dumps({"sender": self.instance_id, "keys": keys})
+        self.redis.publish(self.channel, message)
+
+    def clear(self) -> None:
+        """
+        Deletes the keys under `key_prefix` in batches, the rest of the redis database is kept
+        """
+        self.local.clear()
+        batch = []
+        for key in self.redis.scan_iter(match=self.key_prefix + "*", count=self.CLEAR_BATCH_SIZE):
+            batch.append(key)
+            if len(batch) >= self.CLEAR_BATCH_SIZE:
+                self.redis.delete(*batch)
+                batch = []
+        if batch:
+            self.redis.delete(*batch)
+
+    def _handle_invalidation(self, message: dict) -> None:
+        data = json.loads(message["data"])
+        if data.get("sender") == self.instance_id:
+            return
+        self.local.delete(*data.get("keys", []))
+
+    def _handle_listener_error(self, error: Exception, pubsub, worker) -> None:
+        # invalidations may have been missed while disconnected, L1 can no longer be trusted,
+        # the worker keeps running and pubsub re-subscribes once redis is reachable again
+        LOGGER.warn("RedisCache: invalidation listener failed as %s, clearing local cache", error)
+        self.local.clear()
+        time.sleep(1)
+
+    def start_invalidation_listener(self) -> None:
+        """
+        Subscribes to the invalidation channel in a daemon thread
+        """
+        if self._listener is not None:
+            return
+        LOGGER.info("RedisCache: starting invalidation listener")
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: self._handle_invalidation})
+        self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True,
+                                              exception_handler=self._handle_listener_error)
+
+    def stop_invalidation_listener(self) -> None:
+        if self._listener is None:
+            return
+        self._listener.stop()
+        self._listener = None
+
+
+def create_cache(backend: str) -> CacheBackend:
+    """
+    Returns the cache backend configured by name, one of memory, sqlite, redis
+    """
+    if backend == "memory":
+        return InMemoryCache(settings.L1_CACHE_MAX_SIZE, settings.SPECIAL_SCORE_TTL_SECONDS
+                             + settings.SPECIAL_SCORE_STALE_TTL_SECONDS)
+    if backend == "sqlite":
+        return SQLiteCache(settings.CACHE_SQLITE_PATH)
+    if backend == "redis":
+        return RedisCache(settings.REDIS_URL,
+                          InMemoryCache(settings.L1_CACHE_MAX_SIZE, settings.L1_CACHE_TTL_SECONDS),
+                          CACHE_INVALIDATION_CHANNEL, CACHE_KEY_PREFIX)
+    raise ValueError(f"Unknown cache backend {backend}, possible values are memory, sqlite, redis")
+
+
+score_cache = create_cache(settings.CACHE_BACKEND)
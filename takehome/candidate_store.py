@@ -0,0 +1,171 @@
+"""
+Optional in-process read model of every candidate, enabled by `settings.CANDIDATE_STORE_ENABLED`.
+Skills are kept in columnar arrays, one entry per candidate skill, and the repository
+write functions update the store once their transaction is committed. Writes carry the
+version the candidate got in the database, so a write resuming after a newer one is ignored.
+"""
+import threading
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB, SkillDB
+from takehome.logs import LOGGER
+
+_DELETED = -1
+
+
+class StoredSkill(NamedTuple):
+    skill_id: int
+    name: str
+    expertise_level: int
+
+class StoredCandidate(NamedTuple):
+    """
+    Has the attributes of `CandidateDB` read by the solver and the response builders
+    """
+    id: int
+    name: str
+    skills: List[StoredSkill]
+
+
+class CandidateStore:
+    """
+    Skill rows of a candidate are contiguous in the arrays, an update appends the new rows
+    and marks the old ones deleted, the arrays are compacted once half of the rows are deleted.
+    `_versions` keeps the last version applied per candidate id, removed candidates included.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._candidate_ids = array("q")
+        self._skill_ids = array("q")
+        self._levels = array("b")
+        self._spans: Dict[int, Tuple[int, int]] = {}
+        self._names: Dict[int, str] = {}
+        self._skill_names: Dict[int, str] = {}
+        self._versions: Dict[int, int] = {}
+        self._deleted_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def load(self, db: Session) -> None:
+        """
+        Reads every candidate with three column-only queries, no orm object is built
+        """
+        with self._lock:
+            self._reset()
+            self._skill_names.update(db.execute(select(SkillDB.id, SkillDB.name)).all())
+            for candidate_id, name, version in db.execute(select(CandidateDB.id, CandidateDB.name, CandidateDB.version)):
+                self._names[candidate_id] = name
+                self._versions[candidate_id] = version
+            # skills in the order of the CandidateDB.skills relationship
+            rows = db.execute(select(CandidateSkillDB.candidate_id, CandidateSkillDB.skill_id, CandidateSkillDB.expertise_level)
+                              .order_by(CandidateSkillDB.candidate_id, CandidateSkillDB.id))
+            start = 0
+            for candidate_id, skill_id, expertise_level in rows:
+                if self._candidate_ids and self._candidate_ids[-1] != candidate_id:
+                    self._spans[self._candidate_ids[-1]] = (start, len(self._candidate_ids))
+                    start = len(self._candidate_ids)
+                self._candidate_ids.append(candidate_id)
+                self._skill_ids.append(skill_id)
+                self._levels.append(expertise_level)
+            if self._candidate_ids:
+                self._spans[self._candidate_ids[-1]] = (start, len(self._candidate_ids))
+            self.loaded = True
+        LOGGER.info("CandidateStore: loaded %s candidates with %s skills", len(self._names), len(self._candidate_ids))
+
+    def put(self, candidate_id: int, version: int, name: str, skills: Iterable[Tuple[int, str, int]]) -> None:
+        """
+        Adds or replaces a candidate, skills are (skill id, skill name, expertise level),
+        ignored unless `version` is newer than the stored version of the candidate
+        """
+        self.put_many([(candidate_id, version, name, skills)])
+
+    def put_many(self, candidates: Iterable[Tuple[int, int, str, Iterable[Tuple[int, str, int]]]]) -> None:
+        """
+        `put` of every (candidate id, version, name, skills) under a single lock acquisition
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            for candidate_id, version, name, skills in candidates:
+                if not self._is_newer(candidate_id, version):
+                    continue
+                self._delete_rows(candidate_id)
+                start = len(self._candidate_ids)
+                for skill_id, skill_name, expertise_level in skills:
+                    self._skill_names[skill_id] = skill_name
+                    self._candidate_ids.append(candidate_id)
+                    self._skill_ids.append(skill_id)
+                    self._levels.append(expertise_level)
+                self._spans[candidate_id] = (start, len(self._candidate_ids))
+                self._names[candidate_id] = name
+            self._compact_if_needed()
+
+    def remove(self, candidate_id: int, version: int) -> None:
+        """
+        Removes a candidate deleted at `version`, a put of an older version is ignored afterwards
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            if not self._is_newer(candidate_id, version):
+                return
+            self._delete_rows(candidate_id)
+            self._names.pop(candidate_id, None)
+            self._compact_if_needed()
+
+    def get_many(self, ids: Iterable[int]) -> Tuple[List[StoredCandidate], List[int]]:
+        """
+        Returns the stored candidates in the order of `ids` and the ids which are not stored
+        """
+        candidates = []
+        missing_ids = []
+        with self._lock:
+            for candidate_id in ids:
+                if candidate_id not in self._names:
+                    missing_ids.append(candidate_id)
+                    continue
+                start, end = self._spans.get(candidate_id, (0, 0))
+                skills = [StoredSkill(self._skill_ids[row], self._skill_names[self._skill_ids[row]], self._levels[row])
+                          for row in range(start, end)]
+                candidates.append(StoredCandidate(candidate_id, self._names[candidate_id], skills))
+        return candidates, missing_ids
+
+    def _is_newer(self, candidate_id: int, version: int) -> bool:
+        if version <= self._versions.get(candidate_id, 0):
+            return False
+        self._versions[candidate_id] = version
+        return True
+
+    def _delete_rows(self, candidate_id: int) -> None:
+        start, end = self._spans.pop(candidate_id, (0, 0))
+        for row in range(start, end):
+            self._candidate_ids[row] = _DELETED
+        self._deleted_rows += end - start
+
+    def _compact_if_needed(self) -> None:
+        if self._deleted_rows * 2 <= len(self._candidate_ids):
+            return
+        rows = [row for row in range(len(self._candidate_ids)) if self._candidate_ids[row] != _DELETED]
+        rows.sort(key=lambda row: self._candidate_ids[row])
+        candidate_ids = array("q", (self._candidate_ids[row] for row in rows))
+        self._skill_ids = array("q", (self._skill_ids[row] for row in rows))
+        self._levels = array("b", (self._levels[row] for row in rows))
+        self._candidate_ids = candidate_ids
+        self._spans = {}
+        for row, candidate_id in enumerate(candidate_ids):
+            start, _ = self._spans.get(candidate_id, (row, row))
+            self._spans[candidate_id] = (start, row + 1)
+        self._deleted_rows = 0
+
+
+candidate_store = CandidateStore()
@@ -28,6 +28,68 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     CONSOLE_LOG_LEVEL: str
 
+    # Verified access tokens are cached for at most AUTH_TOKEN_CACHE_TTL_SECONDS and never past their expiry
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: int = 300
+    # Password hashing runs on its own small executor, logins queue there instead of taking every thread
+    AUTH_HASH_WORKERS: int = 2
+    # A username is throttled after LOGIN_MAX_FAILURES logins without a success within LOGIN_FAILURE_WINDOW_SECONDS
+    LOGIN_MAX_FAILURES: int = 5
+    LOGIN_FAILURE_WINDOW_SECONDS: int = 300
+
+    # Database connection pool
+    DB_POOL_SIZE: int = 20
+    DB_POOL_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    DB_BUSY_TIMEOUT_MS: int = 5000
+
+    # Rows inserted per transaction by the bulk import endpoints
+    IMPORT_CHUNK_SIZE: int = 2000
+
+    # Streaming export, candidates read from the database per batch and batches
+    # whose special scores are fetched concurrently
+    EXPORT_BATCH_SIZE: int = 200
+    EXPORT_SCORE_WINDOWS: int = 2
+
+    # Cache backend, one of memory, sqlite, redis
+    CACHE_BACKEND: str = "redis"
+    CACHE_SQLITE_PATH: str = "./cache.db"
+
+    # Keep every candidate and their skills in process memory, loaded at startup,
+    # so form-team reads no candidate from the database. Only correct with a single app process
+    CANDIDATE_STORE_ENABLED: bool = False
+
+    # In-process L1 cache layered over redis, also sizes the memory backend
+    L1_CACHE_MAX_SIZE: int = 10000
+    L1_CACHE_TTL_SECONDS: int = 60
+
+    # Background special score pre-warming
+    SCORE_WORKER_CONCURRENCY: int = 4
+    SCORE_WORKER_QUEUE_SIZE: int = 10000
+    # Shutdown waits at most this long for each worker to finish its current scorer call
+    SCORE_WORKER_STOP_TIMEOUT_SECONDS: float = 5
+
+    # Special score api client
+    SCORER_TIMEOUT_SECONDS: float = 5
+    SCORER_MAX_RETRIES: int = 5
+    SCORER_RETRY_DELAY_SECONDS: float = 2
+    CIRCUIT_BREAKER_WINDOW_SIZE: int = 20
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_RESET_SECONDS: int = 30
+
+    # Process wide limits on calls to the special score api
+    SCORER_EXECUTOR_WORKERS: int = 16
+    SCORER_MAX_IN_FLIGHT: int = 16
+    SCORER_MAX_PENDING_PER_REQUEST: int = 8
+    SCORER_RATE_LIMIT_PER_SECOND: float = 100
+    SCORER_RATE_LIMIT_BURST: int = 20
+
+    # Special scores are fresh for SPECIAL_SCORE_TTL_SECONDS and then served stale,
+    # while being refreshed, for SPECIAL_SCORE_STALE_TTL_SECONDS more
+    SPECIAL_SCORE_TTL_SECONDS: int = 86400
+    SPECIAL_SCORE_STALE_TTL_SECONDS: int = 604800
+
 
 @lru_cache
 def get_settings():
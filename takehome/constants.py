@@ -2,3 +2,10 @@
 Global constant variables
 """
 SPECIAL_SCORE_REDIS_KEY="special_score_{}"
+CACHE_INVALIDATION_CHANNEL="cache_invalidation"
+CACHE_KEY_PREFIX="takehome_cache:"
+SCORE_STATUS_READY="ready"
+SCORE_STATUS_PENDING="pending"
+MAX_BATCH_SIZE=100
+MAX_PATCH_SIZE=1000
+MAX_SKILL_FILTERS=20
@@ -1,7 +1,11 @@
+import atexit
 import logging
 import logging.config
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 from typing_extensions import Any
-from datetime import datetime
+from datetime import datetime, timezone
 from pythonjsonlogger import jsonlogger
 
 from takehome.config import settings
@@ -110,7 +114,8 @@ class CustomJsonFormatter(jsonlogger.JsonFormatter):
         log_record['Simplify_server'] = True
 
         if not log_record.get('emission_timestamp'):
-            now = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            # records are formatted by the listener thread, the timestamp is the time of the log call
+            now = datetime.fromtimestamp(record.created, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
             log_record['emission_timestamp'] = now
 
         if log_record.get('level'):
@@ -120,42 +125,69 @@ class CustomJsonFormatter(jsonlogger.JsonFormatter):
         log_record['message'] = record.message
 
 
+class DeferredQueueHandler(QueueHandler):
+    """
+    Puts records on the queue unformatted, the listener thread merges the message arguments,
+    which `QueueHandler.prepare` would otherwise do on the logging thread.
+    Arguments are rendered late, they must not be mutated after the log call.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+# Log calls only put the record on this queue, the listener thread formats its message and json
+# and writes it with `console_handler`, so request threads never wait on formatting or stdout
+LOG_QUEUE: queue.SimpleQueue = queue.SimpleQueue()
+
+console_handler = logging.StreamHandler(sys.stdout)
+console_handler.setLevel(settings.CONSOLE_LOG_LEVEL)
+console_handler.setFormatter(CustomJsonFormatter("%(emission_timestamp)s %(message)s"))
+
+log_listener = QueueListener(LOG_QUEUE, console_handler, respect_handler_level=True)
+
 LOGGING_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "json": {
-            "()": CustomJsonFormatter,
-            "format": "%(emission_timestamp)s %(message)s"
-        },
-    },
     "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": settings.CONSOLE_LOG_LEVEL,
-            "formatter": "json",
-            "stream": "ext://sys.stdout",
+        "queue": {
+            "()": DeferredQueueHandler,
+            "queue": LOG_QUEUE,
         }
     },
     "loggers": {
         "": {  # root logger
-            "handlers": ["console"],
+            "handlers": ["queue"],
             "level": settings.CONSOLE_LOG_LEVEL,
             "propagate": False
         }
     }
 }
 
+_listener_running = False
+
+def start_logging() -> None:
+    global _listener_running
+    if not _listener_running:
+        log_listener.start()
+        _listener_running = True
+
+#writes every queued record and stops the listener thread
+def stop_logging() -> None:
+    global _listener_running
+    if _listener_running:
+        log_listener.stop()
+        _listener_running = False
+
 def fetch_logger():
     logging.config.dictConfig(LOGGING_CONFIG)
+    start_logging()
 
+    # records propagate to the queue handler of the root logger, which is the only handler
     _logger = logging.getLogger(__name__)
     _logger.setLevel(settings.CONSOLE_LOG_LEVEL)
 
-    # Console Stream logger
-    console_handler = logging.StreamHandler()
-    _logger.addHandler(console_handler)
-
     return _logger
 
+atexit.register(stop_logging)
+
 LOGGER = fetch_logger()
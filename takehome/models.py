@@ -2,7 +2,9 @@
 Models for request, response and general purpose use
 """
 from pydantic import BaseModel, Field, conlist
-from typing import List
+from typing import Dict, List, Optional
+
+from takehome.constants import SCORE_STATUS_READY, MAX_BATCH_SIZE, MAX_PATCH_SIZE
 
 class Skill(BaseModel):
     name: str
@@ -21,7 +23,7 @@ class Candidate(BaseModel):
 class CandidateDictSkills(BaseModel):
     id: int
     name: str
-    skills: dict
+    skills: Dict[int, int] = Field(..., description="Expertise level by skill id")
 
 class ProjectCreateRequest(BaseModel):
     title: str
@@ -34,7 +36,7 @@ class CandidateCreateRequest(BaseModel):
 
 class FormTeamRequest(BaseModel):
     project_id: int
-    candidate_ids: conlist(int, min_length=1, max_length=100)
+    candidate_ids: conlist(int, min_length=1, max_length=MAX_BATCH_SIZE)
     team_size: int = Field(ge=1, le=10)
 
 class FormTeamScore(BaseModel):
@@ -55,20 +57,47 @@ class FormTeamResponse(BaseModel):
 class SkillResponse(BaseModel):
     name: str
     expertise_level: int = Field(ge=1, le=10, description="Skill expertise level (1-10)")
-    special_score: float
+    special_score: Optional[float] = Field(description="None while the score is pending")
 
 class CandidateResponse(BaseModel):
     id: int
     name: str
     skills: List[SkillResponse]
+    score_status: str = Field(default=SCORE_STATUS_READY, description="ready, or pending if scores missed the deadline")
 
 class ProjectListResponse(BaseModel):
     size: int
+    total: Optional[int] = Field(None, description="Number of projects matching the filters across all pages")
     projects: List[Project]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
 
 class CandidateListResponse(BaseModel):
     size: int
+    total: Optional[int] = Field(None, description="Number of candidates matching the filters across all pages")
     candidates: List[CandidateResponse]
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class BulkImportError(BaseModel):
+    line: int
+    error: str
+
+class BulkImportResponse(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BulkImportError]
+
+class SkillsPatch(BaseModel):
+    id: int
+    upsert: List[Skill] = Field(default_factory=list, description="Skills added, or whose expertise level changes")
+    remove: List[str] = Field(default_factory=list, description="Names of the skills removed")
+
+class SkillsPatchRequest(BaseModel):
+    items: conlist(SkillsPatch, min_length=1, max_length=MAX_PATCH_SIZE)
+
+class SkillsPatchResponse(BaseModel):
+    updated: int
 
 class User(BaseModel):
     username: str
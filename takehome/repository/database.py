@@ -1,31 +1,72 @@
 """
-Returns a database singleton
+Database engine and session factories
 """
 from contextlib import contextmanager
+from typing import AsyncIterator, Iterator
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
+from takehome.config import settings
+
 DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+_POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_pre_ping=True,
+)
+
+# sync engine for schema creation, migrations, background workers and scripts
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": settings.DB_BUSY_TIMEOUT_MS / 1000},
+    **_POOL_OPTIONS,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# async engine for request handlers, waiting on the database does not hold a threadpool slot
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    connect_args={"timeout": settings.DB_BUSY_TIMEOUT_MS / 1000},
+    **_POOL_OPTIONS,
+)
+# objects stay usable after commit, async sessions cannot lazily reload expired attributes
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-__SESSION = None
+
+@event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers run concurrently with a writer, synchronous=NORMAL is durable in WAL mode
+    without an fsync on every commit, and busy_timeout makes writers wait instead of failing
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={settings.DB_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI dependency, every request gets its own async session which is closed once the request is done
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
 
 @contextmanager
-def get_db():
+def get_db() -> Iterator[Session]:
     """
-    Make sure this is singleton
-    :return:
+    A new session for code running outside of a request, e.g. background workers and scripts
     """
-    global __SESSION
-    if __SESSION is None:
-        __SESSION = SessionLocal(
-            bind=engine.execution_options(isolation_level="SERIALIZABLE")
-        )
+    db = SessionLocal()
     try:
-        yield __SESSION
+        yield db
     finally:
-        __SESSION.close()
+        db.close()
@@ -2,25 +2,63 @@
 Database tables
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import DDL, Column, Integer, String, Float, ForeignKey, Index, event
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from takehome.repository.database import Base
 
+class SkillDB(Base):
+    """
+    Dictionary of skill names, candidate and project skills refer to a skill by its integer ID.
+
+    Attributes:
+        id (int): The unique identifier for the skill.
+        name (str): The name of the skill (e.g., Python, Java), unique across skills.
+    """
+    __tablename__ = "skills"
+    __table_args__ = (
+        Index("ix_skills_name", "name", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+
+class CollectionVersionDB(Base):
+    """
+    Version of a whole table, incremented in the same transaction as every write to the table,
+    it changes whenever any row is created, updated or deleted.
+
+    Attributes:
+        name (str): The name of the table, e.g. candidates.
+        version (int): The number of writes to the table.
+    """
+    __tablename__ = "collection_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+
 class ProjectDB(Base):
     """
     Represents a project in the database.
 
     Attributes:
         id (int): The unique identifier for the project.
-        title (str): The title of the project.
+        title (str): The title of the project, unique across projects.
+        version (int): The version of the projects table at the last write to the project or its skills,
+                        a new project reusing the id of a deleted one gets a higher version.
         skills (list): A list of skills associated with the project,
                         represented by `ProjectSkillDB`.
     """
     __tablename__ = "projects"
+    __table_args__ = (
+        Index("ix_projects_title", "title", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    skills = relationship("ProjectSkillDB", back_populates="project")
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # ordered explicitly, the skill indexes would otherwise return skills sorted by name
+    skills = relationship("ProjectSkillDB", back_populates="project", order_by="ProjectSkillDB.id")
 
 class CandidateDB(Base):
     """
@@ -28,52 +66,96 @@ class CandidateDB(Base):
 
     Attributes:
         id (int): The unique identifier for the candidate.
-        name (str): The name of the candidate.
+        name (str): The name of the candidate, unique across candidates.
+        version (int): The version of the candidates table at the last write to the candidate or their skills,
+                        a new candidate reusing the id of a deleted one gets a higher version.
         skills (list): A list of skills possessed by the candidate,
                         represented by `CandidateSkillDB`.
     """
     __tablename__ = "candidates"
+    __table_args__ = (
+        Index("ix_candidates_name", "name", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    skills = relationship("CandidateSkillDB", back_populates="candidate")
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    skills = relationship("CandidateSkillDB", back_populates="candidate", order_by="CandidateSkillDB.id")
 
 class CandidateSkillDB(Base):
     """
-    Represents a skill possessed by a candidate.
+    Represents a skill possessed by a candidate, associates a candidate with a `SkillDB`.
 
     Attributes:
         id (int): The unique identifier for the candidate's skill.
-        name (str): The name of the skill (e.g., Python, Java).
+        skill_id (int): The foreign key reference to the skill, unique per candidate.
         expertise_level (int): The level of expertise for the skill (1-10).
         candidate_id (int): The foreign key reference to the associated candidate.
+        version (int): Incremented every time the expertise level of the skill changes.
+        special_score (float): The persisted special score of the skill, second tier behind redis.
+        special_score_version (int): The skill version the special score was computed for,
+                                        the score is only valid while it matches `version`.
+        special_score_fresh_until (float): Unix timestamp after which the special score is stale.
+        skill (SkillDB): The SkillDB orm instance, always loaded with the row,
+                            this is not a database column.
+        name (str): The name of the skill read through `skill`, this is not a database column.
         candidate (CandidateDB): The CandidateDB orm instance to which the skill belongs,
                                     this is not a database column.
     """
     __tablename__ = "candidate_skills"
+    __table_args__ = (
+        # also serves every lookup of the skills of a candidate
+        Index("ix_candidate_skills_candidate_id_skill_id", "candidate_id", "skill_id", unique=True),
+        Index("ix_candidate_skills_skill_id_expertise_level", "skill_id", "expertise_level", "candidate_id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String)
+    skill_id = Column(Integer, ForeignKey("skills.id"), nullable=False)
     expertise_level = Column(Integer)
     candidate_id = Column(Integer, ForeignKey("candidates.id"))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    special_score = Column(Float, nullable=True)
+    special_score_version = Column(Integer, nullable=True)
+    special_score_fresh_until = Column(Float, nullable=True)
+    skill = relationship("SkillDB", lazy="joined", innerjoin=True)
+    name = association_proxy("skill", "name")
     candidate = relationship("CandidateDB", back_populates="skills")
 
 class ProjectSkillDB(Base):
     """
-    Represents a skill required for a project.
+    Represents a skill required for a project, associates a project with a `SkillDB`.
 
     Attributes:
         id (int): The unique identifier for the project's skill.
-        name (str): The name of the skill.
+        skill_id (int): The foreign key reference to the skill, unique per project.
         expertise_level (int): The level of expertise required for the skill (1-10).
         project_id (int): The foreign key reference to the associated project.
+        skill (SkillDB): The SkillDB orm instance, always loaded with the row,
+                            this is not a database column.
+        name (str): The name of the skill read through `skill`, this is not a database column.
         project (ProjectDB): The ProjectDB instance orm to which the skill belongs,
                                 this is not a database column.
     """
     __tablename__ = "project_skills"
+    __table_args__ = (
+        # also serves every lookup of the skills of a project
+        Index("ix_project_skills_project_id_skill_id", "project_id", "skill_id", unique=True),
+        Index("ix_project_skills_skill_id_expertise_level", "skill_id", "expertise_level", "project_id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    name = Column(String)
+    skill_id = Column(Integer, ForeignKey("skills.id"), nullable=False)
     expertise_level = Column(Integer)
     project_id = Column(Integer, ForeignKey("projects.id"))
+    skill = relationship("SkillDB", lazy="joined", innerjoin=True)
+    name = association_proxy("skill", "name")
     project = relationship("ProjectDB", back_populates="skills")
+
+# full text search indexes of candidate names and project titles, see takehome/repository/search.py,
+# rowid of a search row is the id of its candidate/project
+event.listen(CandidateDB.__table__, "after_create",
+             DDL("CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5(name, prefix='2 3')"))
+event.listen(CandidateDB.__table__, "before_drop", DDL("DROP TABLE IF EXISTS candidates_fts"))
+event.listen(ProjectDB.__table__, "after_create",
+             DDL("CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(title, prefix='2 3')"))
+event.listen(ProjectDB.__table__, "before_drop", DDL("DROP TABLE IF EXISTS projects_fts"))
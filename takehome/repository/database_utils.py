@@ -1,119 +1,393 @@
 """
 Used for any interactions with database, READ/WRITE/UPDATE/DELETE
+Functions used by request handlers are async and take an AsyncSession, the ones used by
+background workers and scripts are sync and take a Session.
 """
-from typing import List
+from collections import Counter
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 from fastapi import HTTPException, status
-from sqlalchemy import asc, desc
-from sqlalchemy.orm import joinedload
-
-from takehome.repository.database_models import CandidateDB, ProjectDB, CandidateSkillDB, ProjectSkillDB
-from takehome.repository.database import get_db
+from sqlalchemy import Column, Select, update, bindparam, insert, select, delete, func, false, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from takehome.repository.database_models import CandidateDB, ProjectDB, CandidateSkillDB, ProjectSkillDB, SkillDB
+from takehome.repository.database_models import CollectionVersionDB
+from takehome.repository.pagination import paginate
+from takehome.repository.filters import SkillFilter, matching_parent_ids
+from takehome.repository.search import RELEVANCE, candidates_fts, projects_fts, match_query
 from takehome.models import Project, Candidate, ProjectCreateRequest, CandidateCreateRequest, Skill
-from takehome.models import ProjectListResponse
+from takehome.models import ProjectListResponse, BulkImportError, SkillsPatch
+from takehome.candidate_store import candidate_store
 from takehome.logs import LoggingContext, LOGGER
 
-def get_project_by_title(title: str) -> ProjectDB:
+def _unique_violation(columns) -> str:
+    """
+    The sqlite message of a write rejected by the unique index on `columns`
+    """
+    return "UNIQUE constraint failed: " + ", ".join(f"{column.table.name}.{column.name}" for column in columns)
+
+async def _raise_conflict(db: AsyncSession, error: IntegrityError, key_column: Column, skill_model, detail: str,
+                    local_logging_context: Optional[LoggingContext] = None) -> None:
+    """
+    Roll back a write rejected by a unique index and raise the matching client error,
+    any other integrity error is not caused by the request and is raised again.
+    Args:
+        db (AsyncSession): The database session to use.
+        error (IntegrityError): The error raised by the write.
+        key_column (Column): The unique column of the parent row, e.g. the name column of candidates.
+        skill_model: CandidateSkillDB or ProjectSkillDB, unique on (parent, skill_id).
+        detail (str): The error detail when the parent row collided with `key_column`.
+    Raises:
+        HTTPException: For the parent row or for a skill repeated within the row.
+        IntegrityError: For any other constraint.
+    """
+    await db.rollback()
+    message = str(error.orig)
+    if message == _unique_violation([key_column]):
+        LOGGER.warn(detail, extra=local_logging_context.store if local_logging_context else None)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=detail,
+        )
+    if any(message == _unique_violation(index.columns) for index in skill_model.__table__.indexes if index.unique):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, skill names must be unique",
+        )
+    raise error
+
+async def get_skill_ids(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Map skill names to their IDs in the skills dictionary, adding the names it does not have yet.
+    Args:
+        db (AsyncSession): The database session to use, new skills are part of its transaction.
+        names (Iterable[str]): The skill names, duplicates are ignored.
+    Returns:
+        Dict[str, int]: The ID of every skill name.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    skills_table = SkillDB.__table__
+    await db.execute(sqlite_insert(skills_table).on_conflict_do_nothing(index_elements=[skills_table.c.name]),
+                     [{"name": name} for name in names])
+    rows = await db.execute(select(SkillDB.name, SkillDB.id).where(SkillDB.name.in_(names)))
+    return dict(rows.all())
+
+async def _bump_versions(db: AsyncSession, parent_model, ids: Iterable[int] = ()) -> int:
+    """
+    Increment the version of the whole table of `parent_model` and stamp it on the `ids` rows,
+    called inside the transaction of every write so a reader never sees new data with an old version.
+    The table version only grows, so a row reusing the id of a deleted row never gets its version back.
+    Returns the new version.
+    """
+    table = CollectionVersionDB.__table__
+    statement = sqlite_insert(table).values(name=parent_model.__tablename__, version=1)
+    version = await db.scalar(statement.on_conflict_do_update(index_elements=[table.c.name],
+                                                              set_={"version": table.c.version + 1}).returning(table.c.version))
+    ids = list(ids)
+    if ids:
+        await db.execute(update(parent_model).where(parent_model.id.in_(ids)).values(version=version))
+    return version
+
+async def get_collection_version(db: AsyncSession, parent_model) -> int:
+    """
+    Fetch the version of the whole table of `parent_model`, CandidateDB or ProjectDB.
+    Args:
+        db (AsyncSession): The database session to use.
+        parent_model: CandidateDB or ProjectDB.
+    Returns:
+        int: The number of writes to the table, 0 before the first one.
+    """
+    version = await db.scalar(select(CollectionVersionDB.version).where(
+                    CollectionVersionDB.name == parent_model.__tablename__))
+    return version or 0
+
+async def get_row_version(db: AsyncSession, parent_model, id: int) -> Optional[int]:
     """
-    Fetch a project from the database by its title.
+    Fetch the version of one candidate or project without reading the row itself.
     Args:
-        title (str): The title of the project to search for.
+        db (AsyncSession): The database session to use.
+        parent_model: CandidateDB or ProjectDB.
+        id (int): The unique identifier of the row.
     Returns:
-        ProjectDB: The project instance corresponding to the title, or None if not found.
+        int: The version of the row, or None if not found.
     """
-    with get_db() as db:
-        project = db.query(ProjectDB).filter(ProjectDB.title == title).first()
-        return project
+    return await db.scalar(select(parent_model.version).where(parent_model.id == id))
 
-def get_project_by_id(id: int) -> ProjectDB:
+def _select_by_id_with_skills(parent_model, key_field: str, skill_model, foreign_key: str) -> Select:
+    """
+    Core select of one parent, by the "id" bind parameter, with one row per skill ordered like the skills
+    relationship: (id, key, version, skill name, expertise level), the skill columns are NULL without skills
     """
-    Fetch a project from the database by its ID, including its skills using joinedload.
+    parent_table = parent_model.__table__
+    skill_table = skill_model.__table__
+    skills_table = SkillDB.__table__
+    return select(parent_table.c.id, parent_table.c[key_field], parent_table.c.version,
+                  skills_table.c.name, skill_table.c.expertise_level).select_from(
+        parent_table.outerjoin(skill_table, skill_table.c[foreign_key] == parent_table.c.id).outerjoin(
+            skills_table, skills_table.c.id == skill_table.c.skill_id)
+    ).where(parent_table.c.id == bindparam("id")).order_by(skill_table.c.id)
+
+# built once so every call hits the compiled statement cache, the rows skip the orm identity map
+_PROJECT_BY_ID = _select_by_id_with_skills(ProjectDB, "title", ProjectSkillDB, "project_id")
+_CANDIDATE_BY_ID = _select_by_id_with_skills(CandidateDB, "name", CandidateSkillDB, "candidate_id")
+
+def _skills_of_rows(rows) -> List[Skill]:
+    return [Skill(name=name, expertise_level=expertise_level) for _, _, _, name, expertise_level in rows if name is not None]
+
+async def read_project(db: AsyncSession, id: int) -> Optional[Tuple[Project, int]]:
+    """
+    Read a project and its skills straight into the response model, without building orm objects.
     Args:
+        db (AsyncSession): The database session to use.
+        id (int): The unique identifier of the project.
+    Returns:
+        Tuple[Project, int]: The project with its skills and the version of the project, or None if not found.
+    """
+    rows = (await db.execute(_PROJECT_BY_ID, {"id": id})).all()
+    if not rows:
+        return None
+    return Project(id=rows[0][0], title=rows[0][1], skills=_skills_of_rows(rows)), rows[0][2]
+
+async def get_project_by_id(db: AsyncSession, id: int) -> ProjectDB:
+    """
+    Fetch a project from the database by its ID, including its skills using selectinload.
+    joinedload would nest the skill join of the skill rows and sqlite materializes that join
+    by scanning every project skill.
+    Args:
+        db (AsyncSession): The database session to use.
         id (int): The unique identifier of the project.
     Returns:
         ProjectDB: The project instance corresponding to the ID, or None if not found.
     """
-    with get_db() as db:
-        project = db.query(ProjectDB).options(joinedload(ProjectDB.skills)).filter(
-                        ProjectDB.id == id).first()
-        return project
+    project = (await db.scalars(select(ProjectDB).options(selectinload(ProjectDB.skills)).where(
+                    ProjectDB.id == id))).one_or_none()
+    return project
 
-def create_project_db(project: ProjectCreateRequest, local_logging_context: LoggingContext) -> Project:
+async def create_project_db(db: AsyncSession, project: ProjectCreateRequest, local_logging_context: LoggingContext) -> Project:
     """
     Create a new project in the database with the provided data.
     Args:
+        db (AsyncSession): The database session to use.
         project (ProjectCreateRequest): The project details, and associated skills.
     Returns:
         Project: The formated project response object with its skills.
     Raises:
-        HTTPException: If a project with the same title already exists.
+        HTTPException: If a project with the same title already exists or a skill is repeated.
+    """
+    # the unique index on title rejects duplicates, no separate lookup needed
+    skill_ids = await get_skill_ids(db, (skill.name for skill in project.skills))
+    new_project = ProjectDB(
+        title=project.title,
+        skills=[
+            ProjectSkillDB(skill_id=skill_ids[skill.name], expertise_level=skill.expertise_level)
+            for skill in project.skills
+        ],
+    )
+    db.add(new_project)
+    try:
+        # flush assigns the id so reading it after the commit needs no reload
+        await db.flush()
+        project_id = new_project.id
+        await db.execute(insert(projects_fts).values(rowid=project_id, title=project.title))
+        await _bump_versions(db, ProjectDB, [project_id])
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_conflict(db, error, ProjectDB.__table__.c.title, ProjectSkillDB,
+                              "Invalid Request, Project already exists", local_logging_context)
+
+    local_logging_context.upsert(project_id=project_id)
+    LOGGER.debug("Created New project", extra=local_logging_context.store)
+    return Project(id=project_id, title=project.title, skills=project.skills)
+
+async def _insert_many(db: AsyncSession, table, columns: List[str], rows: List[tuple]) -> None:
+    """
+    executemany of plain tuples on the driver connection, a Core insert processes the parameters
+    of every row in python, which takes longer than sqlite takes to insert them
+    """
+    statement = f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+    await (await db.connection()).exec_driver_sql(statement, rows)
+
+async def _bulk_create(db: AsyncSession, rows: list, parent_model, key_field: str,
+                 skill_model, foreign_key: str, label: str, search_table,
+                 after_commit: Optional[Callable] = None) -> Tuple[int, List[BulkImportError]]:
     """
-    #check if project with same title exist
-    _check_project = get_project_by_title(project.title)
-    if _check_project:
-        LOGGER.warn(f"Invalid Request, Project already exists with id as {_check_project.id}", extra=local_logging_context.store)
+    Insert parents and their skills with one executemany per table inside one transaction.
+    Rows whose key already exists, in the database or earlier in `rows`, are reported instead,
+    the database side is left to the unique index on `key_field` through ON CONFLICT DO NOTHING.
+    `after_commit` is called with the (new id, row) pairs, the skill ids by name and the version
+    stamped on the new rows once committed.
+    """
+    errors = []
+    rows_by_key = {}
+    for line, row in rows:
+        key = getattr(row, key_field)
+        if key in rows_by_key:
+            errors.append(BulkImportError(line=line, error=f"{label} already exists"))
+        elif len({skill.name for skill in row.skills}) != len(row.skills):
+            errors.append(BulkImportError(line=line, error="skill names must be unique"))
+        else:
+            rows_by_key[key] = (line, row)
+
+    inserted = 0
+    new_rows = []
+    skill_ids = {}
+    version = None
+    if rows_by_key:
+        parent_table = parent_model.__table__
+        key_column = parent_table.c[key_field]
+        new_ids = dict((await db.execute(
+            sqlite_insert(parent_table).on_conflict_do_nothing(index_elements=[key_column]).returning(
+                key_column, parent_table.c.id),
+            [{key_field: key} for key in rows_by_key],
+        )).all())
+        for key, (line, row) in rows_by_key.items():
+            if key not in new_ids:
+                errors.append(BulkImportError(line=line, error=f"{label} already exists"))
+                continue
+            new_rows.append((new_ids[key], row))
+        skill_ids = await get_skill_ids(db, (skill.name for _, row in new_rows for skill in row.skills))
+        skill_rows = [
+            (skill_ids[skill.name], skill.expertise_level, new_id)
+            for new_id, row in new_rows
+            for skill in row.skills
+        ]
+        if skill_rows:
+            await _insert_many(db, skill_model.__table__, ["skill_id", "expertise_level", foreign_key], skill_rows)
+        if new_rows:
+            await _insert_many(db, search_table, ["rowid", key_field],
+                               [(new_id, getattr(row, key_field)) for new_id, row in new_rows])
+        inserted = len(new_ids)
+        if new_rows:
+            version = await _bump_versions(db, parent_model, [new_id for new_id, _ in new_rows])
+    await db.commit()
+    if after_commit and new_rows:
+        after_commit(new_rows, skill_ids, version)
+    return inserted, errors
+
+async def _patch_skills(db: AsyncSession, patches: List[SkillsPatch], parent_model, skill_model,
+                        foreign_key: str, label: str) -> List[int]:
+    """
+    Apply the skill deltas of many parents inside one transaction, with one executemany upsert on the
+    unique (parent, skill_id) index and one executemany delete. A skill whose expertise level changes
+    gets a new version in the same statement, when `skill_model` is versioned, which invalidates its
+    persisted special score. Returns the IDs of the patched parents.
+    """
+    parent_ids = [patch.id for patch in patches]
+    repeated_ids = [parent_id for parent_id, count in Counter(parent_ids).items() if count > 1]
+    if repeated_ids:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid Request, Project already exists",
+            detail="Invalid Request, {} ids {} are repeated".format(label, ", ".join(map(str, repeated_ids))),
         )
-
-    with get_db() as db:
-        new_project = ProjectDB(title=project.title)
-        db.add(new_project)
-        db.commit()
-        db.refresh(new_project)
-        
-        for skill in project.skills:
-            new_skill = ProjectSkillDB(
-                name=skill.name,
-                expertise_level=skill.expertise_level,
-                project_id=new_project.id,
+    for patch in patches:
+        names = [skill.name for skill in patch.upsert] + patch.remove
+        if len(set(names)) != len(names):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid Request, skill names must be unique",
             )
-            db.add(new_skill)
-
-        db.commit()
-        db.refresh(new_project)
-
-        local_logging_context.upsert(project_id=new_project.id)
-        LOGGER.debug("Created New project", extra=local_logging_context.store)
-        return Project(
-            id=new_project.id,
-            title=new_project.title,
-            skills=[
-                Skill(name=skill.name, expertise_level=skill.expertise_level)
-                for skill in new_project.skills
-            ],
+    existing_ids = set(await db.scalars(select(parent_model.id).where(parent_model.id.in_(parent_ids))))
+    missing_ids = [parent_id for parent_id in parent_ids if parent_id not in existing_ids]
+    if missing_ids:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, {}s with ids {} do not exist".format(label, ", ".join(map(str, missing_ids))),
         )
 
-def delete_project_db(project_id: int) -> None:
+    skill_table = skill_model.__table__
+    parent_column = skill_table.c[foreign_key]
+    skill_ids = await get_skill_ids(db, (skill.name for patch in patches for skill in patch.upsert))
+    upsert_rows = [
+        {foreign_key: patch.id, "skill_id": skill_ids[skill.name], "expertise_level": skill.expertise_level}
+        for patch in patches
+        for skill in patch.upsert
+    ]
+    if upsert_rows:
+        statement = sqlite_insert(skill_table)
+        values = {"expertise_level": statement.excluded.expertise_level}
+        if "version" in skill_table.c:
+            values["version"] = case((skill_table.c.expertise_level != statement.excluded.expertise_level,
+                                      skill_table.c.version + 1), else_=skill_table.c.version)
+        await db.execute(statement.on_conflict_do_update(index_elements=[parent_column, skill_table.c.skill_id],
+                                                         set_=values), upsert_rows)
+
+    # removing a skill unknown to the dictionary is a no-op, it is not added to it
+    remove_names = {name for patch in patches for name in patch.remove}
+    if remove_names:
+        removed_ids = dict((await db.execute(select(SkillDB.name, SkillDB.id).where(SkillDB.name.in_(remove_names)))).all())
+        delete_rows = [
+            {"b_parent_id": patch.id, "b_skill_id": removed_ids[name]}
+            for patch in patches
+            for name in patch.remove
+            if name in removed_ids
+        ]
+        if delete_rows:
+            await db.execute(delete(skill_table).where(parent_column == bindparam("b_parent_id"),
+                                                       skill_table.c.skill_id == bindparam("b_skill_id")), delete_rows)
+    await _bump_versions(db, parent_model, parent_ids)
+    await db.commit()
+    return parent_ids
+
+async def bulk_create_projects_db(db: AsyncSession, projects: List[Tuple[int, ProjectCreateRequest]]) -> Tuple[int, List[BulkImportError]]:
+    """
+    Create many projects and their skills in one transaction.
+    Args:
+        db (AsyncSession): The database session to use.
+        projects (List[Tuple[int, ProjectCreateRequest]]): The projects with the line they were read from.
+    Returns:
+        Tuple[int, List[BulkImportError]]: The number of projects created and the rows rejected
+                                            because a project with the same title exists.
+    """
+    return await _bulk_create(db, projects, ProjectDB, "title", ProjectSkillDB, "project_id", "Project", projects_fts)
+
+async def patch_project_skills_db(db: AsyncSession, patches: List[SkillsPatch]) -> int:
+    """
+    Add, update and remove skills of many projects in one transaction, the other skills are kept.
+    Args:
+        db (AsyncSession): The database session to use.
+        patches (List[SkillsPatch]): The skills to upsert and the skill names to remove per project.
+    Returns:
+        int: The number of projects patched.
+    Raises:
+        HTTPException: If a project does not exist, is patched twice or a skill is repeated within a patch.
+    """
+    return len(await _patch_skills(db, patches, ProjectDB, ProjectSkillDB, "project_id", "Project"))
+
+async def delete_project_db(db: AsyncSession, project_id: int) -> None:
     """
     Delete a project from the database by its ID, including its associated skills.
     Args:
+        db (AsyncSession): The database session to use.
         project_id (int): The ID of the project to be deleted.
     Raises:
         HTTPException: If the project with the provided ID does not exist.
     """
-    _project = get_project_by_id(project_id)
-    if not _project:
+    await db.execute(delete(ProjectSkillDB).where(ProjectSkillDB.project_id == project_id))
+    await db.execute(delete(projects_fts).where(projects_fts.c.rowid == project_id))
+    result = await db.execute(delete(ProjectDB).where(ProjectDB.id == project_id))
+    if not result.rowcount:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, Project with provided id does not exists",
         )
-    
-    with get_db() as db:
-        db.query(ProjectSkillDB).filter(
-            ProjectSkillDB.project_id == _project.id).delete()
-        db.delete(_project)
-        db.commit()
+    await _bump_versions(db, ProjectDB)
+    await db.commit()
 
-def update_project_db(project: Project) -> Project:
+async def update_project_db(db: AsyncSession, project: Project) -> Project:
     """
     Update the details of an existing project, including its skills.
     Args:
+        db (AsyncSession): The database session to use.
         project (Project): The project data to update, including title and skills.
     Returns:
         Project: The formated project response with skills.
     Raises:
-        HTTPException: If the project does not exist or is missing an ID.
+        HTTPException: If the project does not exist, is missing an ID or repeats a skill.
     """
     if not project.id:
         raise HTTPException(
@@ -121,156 +395,253 @@ def update_project_db(project: Project) -> Project:
             detail="Invalid Request, project id is compulsory",
         )
     
-    with get_db() as db:
-        _project = db.query(ProjectDB).filter(ProjectDB.id == project.id).first()
-        if not _project:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid Request, candidate with provided id does not exists",
-            )
+    _project = (await db.scalars(select(ProjectDB).options(selectinload(ProjectDB.skills)).where(
+                    ProjectDB.id == project.id))).first()
+    if not _project:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, candidate with provided id does not exists",
+        )
         
-        # Update basic candidate details
-        _project.title = _project.title
+    # Update basic candidate details
+    _project.title = _project.title
         
-        existing_skills = {skill.name for skill in _project.skills}
-        input_skills = {skill.name for skill in project.skills}
-
-        # Remove skills not in the input
-        for skill in _project.skills:
-            if skill.name not in input_skills:
-                db.delete(skill)
-
-        # Add or update skills
-        for skill in project.skills:
-            if skill.name in existing_skills:
-                # Update existing skill
-                existing_skill = next((s for s in _project.skills if s.name == skill.name), None)
-                if existing_skill:
-                    existing_skill.name = skill.name
-                    existing_skill.expertise_level = skill.expertise_level
-            else:
-                # Add new skill
-                new_skill = ProjectSkillDB(
-                    name=skill.name,
-                    expertise_level=skill.expertise_level,
-                    project_id=_project.id,
-                )
-                db.add(new_skill)
-
-        #update command
-        db.commit()
-        db.refresh(_project)
-        return Project(
-            id=_project.id,
-            title=_project.title,
-            skills=[
-                Skill(name=skill.name, expertise_level=skill.expertise_level)
-                for skill in _project.skills
-            ],
-        )
+    existing_skills = {skill.name: skill for skill in _project.skills}
+    input_skills = {skill.name for skill in project.skills}
+    skill_ids = await get_skill_ids(db, input_skills - existing_skills.keys())
+
+    # Remove skills not in the input
+    for skill in _project.skills:
+        if skill.name not in input_skills:
+            await db.delete(skill)
+
+    # Add or update skills
+    for skill in project.skills:
+        if skill.name in existing_skills:
+            # Update existing skill
+            existing_skills[skill.name].expertise_level = skill.expertise_level
+        else:
+            # Add new skill
+            new_skill = ProjectSkillDB(
+                skill_id=skill_ids[skill.name],
+                expertise_level=skill.expertise_level,
+                project_id=_project.id,
+            )
+            db.add(new_skill)
 
-def get_candidate_by_name(name: str) -> CandidateDB:
+    #update command
+    try:
+        await _bump_versions(db, ProjectDB, [_project.id])
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_conflict(db, error, ProjectDB.__table__.c.title, ProjectSkillDB, "Invalid Request, Project already exists")
+    await db.refresh(_project, ["skills"])
+    return Project(
+        id=_project.id,
+        title=_project.title,
+        skills=[
+            Skill(name=skill.name, expertise_level=skill.expertise_level)
+            for skill in _project.skills
+        ],
+    )
+
+async def read_candidate(db: AsyncSession, id: int) -> Optional[Tuple[Candidate, int]]:
     """
-    Fetch a candidate from the database by their name.
+    Read a candidate and their skills straight into a model, without building orm objects.
     Args:
-        name (str): The name of the candidate to search for.
+        db (AsyncSession): The database session to use.
+        id (int): The unique identifier of the candidate.
     Returns:
-        CandidateDB: The candidate instance corresponding to the name, or None if not found.
+        Tuple[Candidate, int]: The candidate with their skills and the version of the candidate, or None if not found.
     """
-    with get_db() as db:
-        candidate = db.query(CandidateDB).filter(CandidateDB.name == name).first()
-        return candidate
+    rows = (await db.execute(_CANDIDATE_BY_ID, {"id": id})).all()
+    if not rows:
+        return None
+    return Candidate(id=rows[0][0], name=rows[0][1], skills=_skills_of_rows(rows)), rows[0][2]
 
-def get_candidate_by_id(id: int) -> CandidateDB:
+async def get_candidate_by_id(db: AsyncSession, id: int) -> CandidateDB:
     """
     Fetch a candidate from the database by their ID, including their skills.
     Args:
+        db (AsyncSession): The database session to use.
         id (int): The unique identifier of the candidate.
     Returns:
         CandidateDB: The candidate instance corresponding to the ID, or None if not found.
     """
-    with get_db() as db:
-        candidate = db.query(CandidateDB).options(joinedload(CandidateDB.skills)).filter(
-                        CandidateDB.id == id).first()
-        return candidate
+    candidate = (await db.scalars(select(CandidateDB).options(selectinload(CandidateDB.skills)).where(
+                    CandidateDB.id == id))).one_or_none()
+    return candidate
 
-def create_candidate_db(candidate: CandidateCreateRequest, local_logging_context: LoggingContext) -> Candidate:
+async def get_candidates_by_ids(db: AsyncSession, ids: List[int]) -> List[CandidateDB]:
     """
-    Create a new candidate in the database with the associated skills.
+    Fetch many candidates by their IDs in a single query, including their skills.
+    Candidates held by the candidate store, when it is enabled, are not read from the database.
     Args:
-        candidate (CandidateCreateRequest): The candidate details, including name and skills.
+        db (AsyncSession): The database session to use.
+        ids (List[int]): The unique identifiers of the candidates, duplicates are ignored.
     Returns:
-        Candidate: The formated candidate response object with their skills.
+        List[CandidateDB]: The candidates in the order of `ids`, `StoredCandidate` for the ones
+                            read from the candidate store.
     Raises:
-        HTTPException: If a candidate with the same name already exists.
+        HTTPException: If any of the candidates does not exist, listing every missing ID.
     """
-    #check if candidate with same name exist
-    _check_candidate = get_candidate_by_name(candidate.name)
-    if _check_candidate:
-        LOGGER.warn(f"Invalid Request, candidate already exists with id as {_check_candidate.id}", extra=local_logging_context.store)
+    unique_ids = list(dict.fromkeys(ids))
+    candidates_by_id = {}
+    lookup_ids = unique_ids
+    if candidate_store.loaded:
+        stored_candidates, lookup_ids = candidate_store.get_many(unique_ids)
+        candidates_by_id.update((candidate.id, candidate) for candidate in stored_candidates)
+    if lookup_ids:
+        candidates = (await db.scalars(select(CandidateDB).options(selectinload(CandidateDB.skills)).where(
+                        CandidateDB.id.in_(lookup_ids)))).all()
+        candidates_by_id.update((candidate.id, candidate) for candidate in candidates)
+
+    missing_ids = [candidate_id for candidate_id in unique_ids if candidate_id not in candidates_by_id]
+    if missing_ids:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid Request, candidate already exists",
+            detail="Invalid Request, Candidates with ids {} do not exist".format(", ".join(map(str, missing_ids))),
         )
+    return [candidates_by_id[candidate_id] for candidate_id in unique_ids]
 
-    with get_db() as db:
-        new_candidate = CandidateDB(name=candidate.name)
-        db.add(new_candidate)
-        db.commit()
-        db.refresh(new_candidate)
-        local_logging_context.upsert(candidate_id=new_candidate.id)
-        LOGGER.debug("New Candidate created", extra=local_logging_context.store)
+def get_candidates_after_id(db: Session, after_id: int, size: int) -> List[CandidateDB]:
+    """
+    Fetch the next batch of candidates ordered by ID, used to walk the whole candidates table.
+    Args:
+        db (Session): The database session to use.
+        after_id (int): Only candidates with an ID greater than this are returned.
+        size (int): The maximum number of candidates to return.
+    Returns:
+        List[CandidateDB]: The candidates with their skills loaded.
+    """
+    candidates = db.query(CandidateDB).options(selectinload(CandidateDB.skills)).filter(
+                    CandidateDB.id > after_id).order_by(CandidateDB.id).limit(size).all()
+    return candidates
 
-        for skill in candidate.skills:
-            new_skill = CandidateSkillDB(
-                name=skill.name,
-                expertise_level=skill.expertise_level,
-                candidate_id=new_candidate.id,
-            )
-            db.add(new_skill)
+async def stream_candidates(db: AsyncSession, batch_size: int) -> AsyncIterator[List[CandidateDB]]:
+    """
+    Walk the whole candidates table ordered by ID on a single server side cursor, only one
+    batch of candidates is loaded at a time.
+    Args:
+        db (AsyncSession): The database session to use, dedicated to the walk.
+        batch_size (int): The number of candidates per batch.
+    Returns:
+        AsyncIterator[List[CandidateDB]]: The batches of candidates with their skills loaded.
+    """
+    result = await db.stream_scalars(select(CandidateDB).options(selectinload(CandidateDB.skills))
+                                     .order_by(CandidateDB.id).execution_options(yield_per=batch_size))
+    async for candidates in result.partitions():
+        # the identity map only holds weak references, written batches are freed
+        yield candidates
 
-        db.commit()
-        db.refresh(new_candidate)
+async def create_candidate_db(db: AsyncSession, candidate: CandidateCreateRequest, local_logging_context: LoggingContext) -> Candidate:
+    """
+    Create a new candidate in the database with the associated skills.
+    Args:
+        db (AsyncSession): The database session to use.
+        candidate (CandidateCreateRequest): The candidate details, including name and skills.
+    Returns:
+        Candidate: The formated candidate response object with their skills.
+    Raises:
+        HTTPException: If a candidate with the same name already exists or a skill is repeated.
+    """
+    # the unique index on name rejects duplicates, no separate lookup needed
+    skill_ids = await get_skill_ids(db, (skill.name for skill in candidate.skills))
+    new_candidate = CandidateDB(
+        name=candidate.name,
+        skills=[
+            CandidateSkillDB(skill_id=skill_ids[skill.name], expertise_level=skill.expertise_level)
+            for skill in candidate.skills
+        ],
+    )
+    db.add(new_candidate)
+    try:
+        # flush assigns the id so reading it after the commit needs no reload
+        await db.flush()
+        candidate_id = new_candidate.id
+        await db.execute(insert(candidates_fts).values(rowid=candidate_id, name=candidate.name))
+        version = await _bump_versions(db, CandidateDB, [candidate_id])
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_conflict(db, error, CandidateDB.__table__.c.name, CandidateSkillDB,
+                              "Invalid Request, candidate already exists", local_logging_context)
+    candidate_store.put(candidate_id, version, candidate.name,
+                        [(skill_ids[skill.name], skill.name, skill.expertise_level) for skill in candidate.skills])
+
+    local_logging_context.upsert(candidate_id=candidate_id)
+    LOGGER.debug("New Candidate created", extra=local_logging_context.store)
+    return Candidate(id=candidate_id, name=candidate.name, skills=candidate.skills)
+
+async def bulk_create_candidates_db(db: AsyncSession, candidates: List[Tuple[int, CandidateCreateRequest]]) -> Tuple[int, List[BulkImportError]]:
+    """
+    Create many candidates and their skills in one transaction.
+    Args:
+        db (AsyncSession): The database session to use.
+        candidates (List[Tuple[int, CandidateCreateRequest]]): The candidates with the line they were read from.
+    Returns:
+        Tuple[int, List[BulkImportError]]: The number of candidates created and the rows rejected
+                                            because a candidate with the same name exists.
+    """
+    def store_candidates(new_rows: list, skill_ids: Dict[str, int], version: int) -> None:
+        candidate_store.put_many((candidate_id, version, candidate.name,
+                                  [(skill_ids[skill.name], skill.name, skill.expertise_level) for skill in candidate.skills])
+                                 for candidate_id, candidate in new_rows)
 
-        return Candidate(
-            id=new_candidate.id,
-            name=new_candidate.name,
-            skills=[
-                Skill(name=skill.name, expertise_level=skill.expertise_level)
-                for skill in new_candidate.skills
-            ],
-        )
+    return await _bulk_create(db, candidates, CandidateDB, "name", CandidateSkillDB, "candidate_id", "Candidate",
+                              candidates_fts, store_candidates)
 
-def delete_candidate_db(candidate_id: int) -> None:
+async def patch_candidate_skills_db(db: AsyncSession, patches: List[SkillsPatch]) -> List[CandidateDB]:
+    """
+    Add, update and remove skills of many candidates in one transaction, the other skills are kept.
+    Args:
+        db (AsyncSession): The database session to use.
+        patches (List[SkillsPatch]): The skills to upsert and the skill names to remove per candidate.
+    Returns:
+        List[CandidateDB]: The patched candidates with their skills, read back with one query.
+    Raises:
+        HTTPException: If a candidate does not exist, is patched twice or a skill is repeated within a patch.
+    """
+    candidate_ids = await _patch_skills(db, patches, CandidateDB, CandidateSkillDB, "candidate_id", "Candidate")
+    candidates = (await db.scalars(select(CandidateDB).options(selectinload(CandidateDB.skills)).where(
+                    CandidateDB.id.in_(candidate_ids)).order_by(CandidateDB.id))).all()
+    candidate_store.put_many((candidate.id, candidate.version, candidate.name,
+                              [(skill.skill_id, skill.name, skill.expertise_level) for skill in candidate.skills])
+                             for candidate in candidates)
+    return candidates
+
+async def delete_candidate_db(db: AsyncSession, candidate_id: int) -> None:
     """
     Delete a candidate from the database by their ID, including their associated skills.
     Args:
+        db (AsyncSession): The database session to use.
         candidate_id (int): The ID of the candidate to be deleted.
     Raises:
         HTTPException: If the candidate with the provided ID does not exist.
     """
-    _candidate = get_candidate_by_id(candidate_id)
-    if not _candidate:
+    await db.execute(delete(CandidateSkillDB).where(CandidateSkillDB.candidate_id == candidate_id))
+    await db.execute(delete(candidates_fts).where(candidates_fts.c.rowid == candidate_id))
+    result = await db.execute(delete(CandidateDB).where(CandidateDB.id == candidate_id))
+    if not result.rowcount:
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid Request, Candidate with provided id does not exists",
         )
-    
-    with get_db() as db:
-        db.query(CandidateSkillDB).filter(
-            CandidateSkillDB.candidate_id == _candidate.id).delete()
-        db.delete(_candidate)
-        db.commit()
+    version = await _bump_versions(db, CandidateDB)
+    await db.commit()
+    candidate_store.remove(candidate_id, version)
 
-def update_candidate_db(candidate: Candidate) -> CandidateDB:
+async def update_candidate_db(db: AsyncSession, candidate: Candidate) -> CandidateDB:
     """
     Update the details of an existing candidate, including their skills.
     Args:
+        db (AsyncSession): The database session to use.
         candidate (Candidate): The candidate data to update, including name and skills.
     Returns:
         Candidate: The updated candidate with their skills.
     Raises:
-        HTTPException: If the candidate does not exist or is missing an ID.
+        HTTPException: If the candidate does not exist, is missing an ID, takes the name
+                        of another candidate or repeats a skill.
     """
     if not candidate.id:
         raise HTTPException(
@@ -278,143 +649,213 @@ def update_candidate_db(candidate: Candidate) -> CandidateDB:
             detail="Invalid Request, candidate id is compulsory",
         )
     
-    with get_db() as db:
-        _candidate = db.query(CandidateDB).filter(CandidateDB.id == candidate.id).first()
-        if not _candidate:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid Request, candidate with provided id does not exists",
-            )
+    _candidate = (await db.scalars(select(CandidateDB).options(selectinload(CandidateDB.skills)).where(
+                    CandidateDB.id == candidate.id))).first()
+    if not _candidate:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, candidate with provided id does not exists",
+        )
         
-        # Update basic candidate details
+    # Update basic candidate details
+    if _candidate.name != candidate.name:
         _candidate.name = candidate.name
+        await db.execute(update(candidates_fts).where(candidates_fts.c.rowid == _candidate.id).values(name=candidate.name))
         
-        existing_skills = {skill.name for skill in _candidate.skills}
-        input_skills = {skill.name for skill in candidate.skills}
-
-        # Remove skills not in the input
-        for skill in _candidate.skills:
-            if skill.name not in input_skills:
-                db.delete(skill)
-
-        # Add or update skills
-        for skill in candidate.skills:
-            if skill.name in existing_skills:
-                # Update existing skill
-                existing_skill = next((s for s in _candidate.skills if s.name == skill.name), None)
-                if existing_skill:
-                    existing_skill.name = skill.name
-                    existing_skill.expertise_level = skill.expertise_level
-            else:
-                # Add new skill
-                new_skill = CandidateSkillDB(
-                    name=skill.name,
-                    expertise_level=skill.expertise_level,
-                    candidate_id=_candidate.id,
-                )
-                db.add(new_skill)
-
-        #update command
-        db.commit()
-        db.refresh(_candidate)
-        return Candidate(
-            id=_candidate.id,
-            name=_candidate.name,
-            skills=[
-                Skill(name=skill.name, expertise_level=skill.expertise_level)
-                for skill in _candidate.skills
-            ],
-        )
+    existing_skills = {skill.name: skill for skill in _candidate.skills}
+    input_skills = {skill.name for skill in candidate.skills}
+    skill_ids = await get_skill_ids(db, input_skills - existing_skills.keys())
+
+    # Remove skills not in the input
+    for skill in _candidate.skills:
+        if skill.name not in input_skills:
+            await db.delete(skill)
+
+    # Add or update skills
+    for skill in candidate.skills:
+        if skill.name in existing_skills:
+            # Update existing skill
+            existing_skill = existing_skills[skill.name]
+            if existing_skill.expertise_level != skill.expertise_level:
+                # persisted special score no longer matches the skill
+                existing_skill.version += 1
+            existing_skill.expertise_level = skill.expertise_level
+        else:
+            # Add new skill
+            new_skill = CandidateSkillDB(
+                skill_id=skill_ids[skill.name],
+                expertise_level=skill.expertise_level,
+                candidate_id=_candidate.id,
+            )
+            db.add(new_skill)
 
-def get_project_list(skip: int, size: int,
-                        title: str, skill_required: str,
-                        sort_by: str, order: str) -> ProjectListResponse:
+    #update command
+    try:
+        version = await _bump_versions(db, CandidateDB, [_candidate.id])
+        await db.commit()
+    except IntegrityError as error:
+        await _raise_conflict(db, error, CandidateDB.__table__.c.name, CandidateSkillDB, "Invalid Request, candidate already exists")
+    await db.refresh(_candidate, ["skills"])
+    candidate_store.put(_candidate.id, version, _candidate.name,
+                        [(skill.skill_id, skill.name, skill.expertise_level) for skill in _candidate.skills])
+    return Candidate(
+        id=_candidate.id,
+        name=_candidate.name,
+        skills=[
+            Skill(name=skill.name, expertise_level=skill.expertise_level)
+            for skill in _candidate.skills
+        ],
+    )
+
+def get_stored_special_scores(db: Session, candidate_id: int) -> Dict[Tuple[str, int], Tuple[float, float]]:
+    """
+    Fetch the persisted special scores of a candidate which are still valid for the current skill version.
+    Args:
+        db (Session): The database session to use.
+        candidate_id (int): The ID of the candidate.
+    Returns:
+        dict: Maps (skill name, expertise level) to (special score, fresh until unix timestamp).
+    """
+    rows = db.query(SkillDB.name, CandidateSkillDB.expertise_level,
+                    CandidateSkillDB.special_score, CandidateSkillDB.special_score_fresh_until).join(
+                    SkillDB, SkillDB.id == CandidateSkillDB.skill_id).filter(
+                    CandidateSkillDB.candidate_id == candidate_id,
+                    CandidateSkillDB.special_score_version == CandidateSkillDB.version).all()
+    return {(name, level): (score, fresh_until) for name, level, score, fresh_until in rows}
+
+def save_special_scores_db(db: Session, candidate_id: int, special_scores: Dict[Tuple[str, int], float], fresh_until: float) -> None:
+    """
+    Persist special scores on the skills of a candidate, stamped with the current skill version.
+    A score is skipped if the expertise level of the skill changed since it was requested.
+    Args:
+        db (Session): The database session to use.
+        candidate_id (int): The ID of the candidate.
+        special_scores (dict): Maps (skill name, expertise level) to the special score.
+        fresh_until (float): Unix timestamp after which the scores are stale.
+    """
+    if not special_scores:
+        return
+    table = CandidateSkillDB.__table__
+    statement = update(table).where(
+        table.c.candidate_id == bindparam("b_candidate_id"),
+        table.c.skill_id == select(SkillDB.id).where(SkillDB.name == bindparam("b_name")).scalar_subquery(),
+        table.c.expertise_level == bindparam("b_expertise_level"),
+    ).values(
+        special_score=bindparam("b_special_score"),
+        special_score_version=table.c.version,
+        special_score_fresh_until=bindparam("b_fresh_until"),
+    )
+    params = [
+        {"b_candidate_id": candidate_id, "b_name": name, "b_expertise_level": level,
+         "b_special_score": score, "b_fresh_until": fresh_until}
+        for (name, level), score in special_scores.items()
+    ]
+    db.execute(statement, params)
+    db.commit()
+
+async def get_project_list(db: AsyncSession, skip: int, size: int,
+                        title: str, skill_filters: List[SkillFilter],
+                        sort_by: str, order: str, cursor: Optional[str] = None) -> ProjectListResponse:
     """
     Retrieve a list of projects from the database with optional filters and pagination.
     Args:
-        skip (int): The number of records to skip for pagination.
+        db (AsyncSession): The database session to use.
+        skip (int): The number of records to skip for pagination, ignored when a cursor is given.
         size (int): The number of records to retrieve per page.
-        title (str): The title of the project to filter by (optional).
-        skill_name (str): The skill name associated with the project to filter by (optional).
-        sort_by (str): The field to sort the results by (e.g., 'id', 'title').
+        title (str): Search text, every token has to start a word of the title (optional).
+        skill_filters (List[SkillFilter]): Skills the project must require within the expertise ranges,
+                                            merged with `merge_skill_filters` (optional).
+        sort_by (str): The field to sort the results by (e.g., 'id', 'title'), or 'relevance' to
+                        rank by how well the title matches the search text, best first in 'asc' order.
         order (str): The sort order, either 'asc' (ascending) or 'desc' (descending).
+        cursor (str): The next_cursor or prev_cursor of a previous page (optional).
     Returns:
-        ProjectListResponse: A response containing the list of projects and the total size.
+        ProjectListResponse: A response containing the list of projects, the page size, the number of
+                                projects matching the filters and the page cursors.
     Raises:
-        HTTPException: If any errors occur during the database query.
+        HTTPException: If the cursor is not valid.
     """
-    with get_db() as db:
-        # Build the query for filtering
-        query = db.query(ProjectDB).options(joinedload(ProjectDB.skills))
-
-        # Apply title filter if provided
-        if title:
-            query = query.filter(ProjectDB.title.ilike(f"%{title}%"))
-
-        # Apply skill_name filter if provided
-        if skill_required:
-            query = query.join(ProjectSkillDB).filter(ProjectSkillDB.name == skill_required)
-
-        if order == "asc":
-            query = query.order_by(asc(getattr(ProjectDB, sort_by)))
-        else:
-            query = query.order_by(desc(getattr(ProjectDB, sort_by)))
-
-        # Apply pagination (skip and limit)
-        query = query.offset(skip).limit(size)
-
-        # Execute the query and return the result
-        projects = query.all()
+    # Build the filters, shared by the page and the total count
+    query = select(ProjectDB).options(selectinload(ProjectDB.skills))
+    count_query = select(func.count(ProjectDB.id))
+    conditions = []
+    sort_column = None
+
+    # Apply title search if provided, through the full text index
+    if title:
+        query = query.join(projects_fts, projects_fts.c.rowid == ProjectDB.id)
+        count_query = count_query.join(projects_fts, projects_fts.c.rowid == ProjectDB.id)
+        match = match_query(title)
+        conditions.append(projects_fts.c.title.match(match) if match else false())
+        if sort_by == RELEVANCE:
+            sort_column = projects_fts.c.rank
+
+    # Apply skill filters if provided
+    if skill_filters:
+        conditions.append(ProjectDB.id.in_(matching_parent_ids(ProjectSkillDB, ProjectSkillDB.project_id, skill_filters)))
+
+    # Execute the query for the requested page
+    projects, next_cursor, prev_cursor = await paginate(db, query.where(*conditions), ProjectDB, sort_by, order,
+                                                        size, cursor, skip, sort_column)
+    total = await db.scalar(count_query.where(*conditions))
+
+    project_responses = []
+    for project in projects:
+        skill_response = []
+        for skill in project.skills:
+            skill_tmp = Skill(name=skill.name, expertise_level=skill.expertise_level)
+            skill_response.append(skill_tmp)
 
-        project_responses = []
-        for project in projects:
-            skill_response = []
-            for skill in project.skills:
-                skill_tmp = Skill(name=skill.name, expertise_level=skill.expertise_level)
-                skill_response.append(skill_tmp)
+        tmp_response = Project(id=project.id, title=project.title, skills=skill_response)
+        project_responses.append(tmp_response)
 
-            tmp_response = Project(id=project.id, title=project.title, skills=skill_response)
-            project_responses.append(tmp_response)
-        
-        return ProjectListResponse(size=len(project_responses), projects=project_responses)
+    return ProjectListResponse(size=len(project_responses), total=total, projects=project_responses,
+                               next_cursor=next_cursor, prev_cursor=prev_cursor)
 
-def get_candidate_list(skip: int, size: int,
-                        name: str, skill_required: str,
-                        sort_by: str, order: str) -> List[CandidateDB]:
+async def get_candidate_list(db: AsyncSession, skip: int, size: int,
+                        name: str, skill_filters: List[SkillFilter],
+                        sort_by: str, order: str,
+                        cursor: Optional[str] = None) -> Tuple[List[CandidateDB], int, Optional[str], Optional[str]]:
     """
     Retrieve a list of candidates from the database with optional filters and pagination.
     Args:
-        skip (int): The number of records to skip for pagination.
+        db (AsyncSession): The database session to use.
+        skip (int): The number of records to skip for pagination, ignored when a cursor is given.
         size (int): The number of records to retrieve per page.
-        name (str): The name of the candidate to filter by (optional).
-        skill_name (str): The skill name associated with the candidate to filter by (optional).
-        sort_by (str): The field to sort the results by (e.g., 'id', 'name').
+        name (str): Search text, every token has to start a word of the name (optional).
+        skill_filters (List[SkillFilter]): Skills the candidate must have within the expertise ranges,
+                                            merged with `merge_skill_filters` (optional).
+        sort_by (str): The field to sort the results by (e.g., 'id', 'name'), or 'relevance' to
+                        rank by how well the name matches the search text, best first in 'asc' order.
         order (str): The sort order, either 'asc' (ascending) or 'desc' (descending).
+        cursor (str): The next_cursor or prev_cursor of a previous page (optional).
     Returns:
-        List[CandidateDB]: A list of candidates matching the filters and pagination criteria.
+        Tuple: The candidates matching the filters for the requested page, the number of candidates
+                matching the filters, the next and previous page cursors.
     Raises:
-        HTTPException: If any errors occur during the database query.
+        HTTPException: If the cursor is not valid.
     """
-    with get_db() as db:
-        # Build the query for filtering
-        query = db.query(CandidateDB).options(joinedload(CandidateDB.skills))
-
-        # Apply title filter if provided
-        if name:
-            query = query.filter(CandidateDB.name.ilike(f"%{name}%"))
-
-        # Apply skill_name filter if provided
-        if skill_required:
-            query = query.join(CandidateSkillDB).filter(CandidateSkillDB.name == skill_required)
-
-        if order == "asc":
-            query = query.order_by(asc(getattr(CandidateDB, sort_by)))
-        else:
-            query = query.order_by(desc(getattr(CandidateDB, sort_by)))
-
-        # Apply pagination (skip and limit)
-        query = query.offset(skip).limit(size)
-
-        # Execute the query and return the result
-        candidates = query.all()
-        return candidates
+    # Build the filters, shared by the page and the total count
+    query = select(CandidateDB).options(selectinload(CandidateDB.skills))
+    count_query = select(func.count(CandidateDB.id))
+    conditions = []
+    sort_column = None
+
+    # Apply name search if provided, through the full text index
+    if name:
+        query = query.join(candidates_fts, candidates_fts.c.rowid == CandidateDB.id)
+        count_query = count_query.join(candidates_fts, candidates_fts.c.rowid == CandidateDB.id)
+        match = match_query(name)
+        conditions.append(candidates_fts.c.name.match(match) if match else false())
+        if sort_by == RELEVANCE:
+            sort_column = candidates_fts.c.rank
+
+    # Apply skill filters if provided
+    if skill_filters:
+        conditions.append(CandidateDB.id.in_(matching_parent_ids(CandidateSkillDB, CandidateSkillDB.candidate_id, skill_filters)))
+
+    # Execute the query for the requested page
+    candidates, next_cursor, prev_cursor = await paginate(db, query.where(*conditions), CandidateDB, sort_by, order,
+                                                          size, cursor, skip, sort_column)
+    total = await db.scalar(count_query.where(*conditions))
+    return candidates, total, next_cursor, prev_cursor
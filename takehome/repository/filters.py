@@ -0,0 +1,93 @@
+"""
+Skill predicates of the list endpoints, evaluated in SQL on the (skill_id, expertise_level) indexes
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, and_, func, or_, select
+
+from takehome.repository.database_models import SkillDB
+
+
+class SkillFilter(NamedTuple):
+    name: str
+    min_level: Optional[int]
+    max_level: Optional[int]
+
+
+def skill_id_of(name: str):
+    """
+    Scalar subquery of the ID of a skill name, NULL when the skill is unknown
+    """
+    return select(SkillDB.id).where(SkillDB.name == name).scalar_subquery()
+
+def _invalid_filter(value: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Invalid Request, skill filter {value} must look like Python, Python:7 or Python:5-8",
+    )
+
+def parse_skill_filter(value: str) -> SkillFilter:
+    """
+    Parses "name", "name:min" or "name:min-max", e.g. "Python:7" matches an expertise level of at least 7.
+    Raises:
+        HTTPException: If the filter is malformed.
+    """
+    name, separator, levels = value.rpartition(":")
+    if not separator:
+        name, levels = value, ""
+    name = name.strip()
+    if not name:
+        raise _invalid_filter(value)
+    if not levels:
+        return SkillFilter(name, None, None)
+
+    min_level, _, max_level = levels.partition("-")
+    try:
+        min_level = int(min_level) if min_level.strip() else None
+        max_level = int(max_level) if max_level.strip() else None
+    except ValueError:
+        raise _invalid_filter(value)
+    if min_level is not None and max_level is not None and min_level > max_level:
+        raise _invalid_filter(value)
+    return SkillFilter(name, min_level, max_level)
+
+def merge_skill_filters(filters: List[SkillFilter]) -> List[SkillFilter]:
+    """
+    Filters on the same skill are combined into the intersection of their ranges,
+    so every remaining filter has to match a different skill row
+    """
+    merged: Dict[str, SkillFilter] = {}
+    for skill_filter in filters:
+        current = merged.get(skill_filter.name)
+        if current is None:
+            merged[skill_filter.name] = skill_filter
+            continue
+        levels = [level for level in (current.min_level, skill_filter.min_level) if level is not None]
+        min_level = max(levels) if levels else None
+        levels = [level for level in (current.max_level, skill_filter.max_level) if level is not None]
+        max_level = min(levels) if levels else None
+        merged[skill_filter.name] = SkillFilter(skill_filter.name, min_level, max_level)
+    return list(merged.values())
+
+def matching_parent_ids(skill_model, parent_column, filters: List[SkillFilter]) -> Select:
+    """
+    Select of the IDs of the candidates/projects having a skill row matching every filter.
+    Each filter matches at most one row per parent, (parent, skill_id) being unique, so parents
+    matching all of them are the groups with as many matching rows as there are filters.
+    Args:
+        skill_model: CandidateSkillDB or ProjectSkillDB.
+        parent_column: The foreign key column of `skill_model` to the parent.
+        filters (List[SkillFilter]): The merged filters, see `merge_skill_filters`.
+    """
+    predicates = []
+    for skill_filter in filters:
+        conditions = [skill_model.skill_id == skill_id_of(skill_filter.name)]
+        if skill_filter.min_level is not None:
+            conditions.append(skill_model.expertise_level >= skill_filter.min_level)
+        if skill_filter.max_level is not None:
+            conditions.append(skill_model.expertise_level <= skill_filter.max_level)
+        predicates.append(and_(*conditions))
+
+    return select(parent_column).where(or_(*predicates)).group_by(parent_column).having(
+                func.count() == len(filters))
@@ -0,0 +1,105 @@
+"""
+Schema migrations applied on startup on top of `Base.metadata.create_all`,
+applied migrations are tracked with sqlite `PRAGMA user_version`.
+Every migration must be a no-op on a schema freshly created from the models.
+"""
+from typing import Callable, List
+
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection, Engine
+
+from takehome.logs import LOGGER
+
+
+def _column_names(connection: Connection, table: str) -> set:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+def _add_candidate_skill_special_score(connection: Connection) -> None:
+    columns = _column_names(connection, "candidate_skills")
+    new_columns = {
+        "version": "INTEGER NOT NULL DEFAULT 1",
+        "special_score": "FLOAT",
+        "special_score_version": "INTEGER",
+        "special_score_fresh_until": "FLOAT",
+    }
+    for name, definition in new_columns.items():
+        if name not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE candidate_skills ADD COLUMN {name} {definition}")
+
+def _add_hot_path_indexes(connection: Connection) -> None:
+    # fails loudly if existing rows already violate a unique index, they have to be cleaned up by hand
+    connection.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_candidates_name ON candidates (name)")
+    connection.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_projects_title ON projects (title)")
+    for table, parent_column in (("candidate_skills", "candidate_id"), ("project_skills", "project_id")):
+        # skill names moved to the skills table, see _normalize_skill_names, a fresh schema has no name column
+        if "name" not in _column_names(connection, table):
+            continue
+        connection.exec_driver_sql(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_{parent_column}_name ON {table} ({parent_column}, name)")
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_name_expertise_level ON {table} (name, expertise_level, {parent_column})")
+
+def _normalize_skill_names(connection: Connection) -> None:
+    connection.exec_driver_sql("CREATE TABLE IF NOT EXISTS skills (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL)")
+    connection.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_skills_name ON skills (name)")
+    for table, parent_column in (("candidate_skills", "candidate_id"), ("project_skills", "project_id")):
+        if "name" in _column_names(connection, table):
+            # the name indexes of _add_hot_path_indexes have to go before the column can be dropped
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_{parent_column}_name")
+            connection.exec_driver_sql(f"DROP INDEX IF EXISTS ix_{table}_name_expertise_level")
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN skill_id INTEGER REFERENCES skills (id)")
+            connection.exec_driver_sql(f"INSERT OR IGNORE INTO skills (name) SELECT DISTINCT name FROM {table} WHERE name IS NOT NULL")
+            connection.exec_driver_sql(
+                f"UPDATE {table} SET skill_id = (SELECT skills.id FROM skills WHERE skills.name = {table}.name)")
+            connection.exec_driver_sql(f"DELETE FROM {table} WHERE skill_id IS NULL")
+            connection.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN name")
+        connection.exec_driver_sql(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_{parent_column}_skill_id ON {table} ({parent_column}, skill_id)")
+        connection.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_skill_id_expertise_level ON {table} (skill_id, expertise_level, {parent_column})")
+
+def _add_search_index(connection: Connection) -> None:
+    for table, column in (("candidates", "name"), ("projects", "title")):
+        connection.exec_driver_sql(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5({column}, prefix='2 3')")
+        connection.exec_driver_sql(
+            f"INSERT INTO {table}_fts (rowid, {column}) SELECT id, {column} FROM {table} "
+            f"WHERE id NOT IN (SELECT rowid FROM {table}_fts)")
+
+def _add_row_versions(connection: Connection) -> None:
+    for table in ("candidates", "projects"):
+        if "version" not in _column_names(connection, table):
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS collection_versions (name VARCHAR NOT NULL PRIMARY KEY, version INTEGER NOT NULL)")
+    # the table version must start at the highest row version, the next write would otherwise stamp
+    # version 1 again on an existing row and leave its etag unchanged
+    for table in ("candidates", "projects"):
+        connection.exec_driver_sql(
+            f"INSERT INTO collection_versions (name, version) SELECT '{table}', MAX(version) FROM {table} "
+            f"WHERE true HAVING count(*) > 0 "
+            f"ON CONFLICT (name) DO UPDATE SET version = max(version, excluded.version)")
+
+
+# append only, the position of a migration is its schema version
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    _add_candidate_skill_special_score,
+    _add_hot_path_indexes,
+    _normalize_skill_names,
+    _add_search_index,
+    _add_row_versions,
+]
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Applies every migration newer than the current schema version in a single transaction.
+    pysqlite only opens a transaction before DML and would autocommit every DDL statement,
+    the explicit BEGIN makes a failing migration roll back the whole schema change and its version.
+    """
+    with engine.begin() as connection:
+        connection.exec_driver_sql("BEGIN")
+        current_version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        for version, migration in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+            LOGGER.info("Applying migration %s: %s", version, migration.__name__)
+            migration(connection)
+            connection.exec_driver_sql(f"PRAGMA user_version = {version}")
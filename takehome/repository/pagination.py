@@ -0,0 +1,105 @@
+"""
+Keyset (cursor) pagination over (sort column, id)
+"""
+import base64
+import json
+from typing import List, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT = "next"
+PREV = "prev"
+
+
+class Cursor(NamedTuple):
+    sort_by: str
+    order: str
+    direction: str
+    value: object
+    id: int
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    """
+    Cursors are opaque to clients, base64 of the position of the first/last row of a page
+    """
+    data = json.dumps(cursor._asdict(), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode()
+
+def decode_cursor(cursor: str, sort_by: str, order: str) -> Cursor:
+    """
+    Raises:
+        HTTPException: If the cursor is malformed or was issued for another sort_by/order.
+    """
+    try:
+        decoded = Cursor(**json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, cursor is not valid",
+        )
+    if decoded.sort_by != sort_by or decoded.order != order or decoded.direction not in (NEXT, PREV):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid Request, cursor does not match sort_by and order",
+        )
+    return decoded
+
+async def paginate(db: AsyncSession, query: Select, model, sort_by: str, order: str, size: int,
+                   cursor: Optional[str] = None, skip: int = 0,
+                   sort_column=None) -> Tuple[List, Optional[str], Optional[str]]:
+    """
+    Returns one page of `query` ordered by (sort column, id) with the cursors of the next and previous pages.
+    With a cursor the page starts right after (or before) the cursor position using the
+    (sort column, id) index, so every page costs the same. Without one the first page is returned,
+    or the page starting at `skip` rows for offset based callers.
+    Args:
+        db (AsyncSession): The database session to use.
+        query (Select): The filtered select of `model` rows.
+        model: The orm model, must have an `id` column.
+        sort_by (str): The column to sort by.
+        order (str): asc or desc.
+        size (int): The number of rows in a page.
+        cursor (str): A next_cursor/prev_cursor returned by a previous call.
+        skip (int): The number of rows to skip, ignored when a cursor is given.
+        sort_column: The expression to sort by when `sort_by` is not a column of `model`, e.g. a search rank.
+    Returns:
+        Tuple[List, Optional[str], Optional[str]]: The rows, the next cursor and the previous cursor,
+                                                    cursors are None when there is no such page.
+    """
+    if sort_column is None:
+        sort_column = getattr(model, sort_by)
+    key = tuple_(sort_column, model.id) if sort_by != "id" else model.id
+    direction = NEXT
+    if cursor is not None:
+        position = decode_cursor(cursor, sort_by, order)
+        direction = position.direction
+        position_key = tuple_(position.value, position.id) if sort_by != "id" else position.id
+        # walking backwards flips the comparison and the order, the rows are reversed afterwards
+        ascending = (order == "asc") == (direction == NEXT)
+        query = query.where(key > position_key if ascending else key < position_key)
+    else:
+        ascending = order == "asc"
+        if skip:
+            query = query.offset(skip)
+
+    order_columns = [sort_column, model.id] if sort_by != "id" else [model.id]
+    query = query.order_by(*[column.asc() if ascending else column.desc() for column in order_columns])
+    # the sort value is selected along each row, the cursors are built from it
+    results = (await db.execute(query.add_columns(sort_column).limit(size + 1))).all()
+    has_more = len(results) > size
+    results = results[:size]
+    if direction == PREV:
+        results.reverse()
+    rows = [result[0] for result in results]
+
+    def cursor_for(result, row_direction: str) -> str:
+        return encode_cursor(Cursor(sort_by, order, row_direction, result[1], result[0].id))
+
+    has_next = has_more if direction == NEXT else True
+    has_prev = (cursor is not None or skip > 0) if direction == NEXT else has_more
+    next_cursor = cursor_for(results[-1], NEXT) if results and has_next else None
+    prev_cursor = cursor_for(results[0], PREV) if results and has_prev else None
+    return rows, next_cursor, prev_cursor
@@ -0,0 +1,39 @@
+"""
+Prefix search over candidate names and project titles with the SQLite FTS5 indexes
+created next to the candidates and projects tables
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table
+
+RELEVANCE = "relevance"
+
+# the virtual tables are created by DDL events in database_models, this metadata is
+# only used to build queries and is never passed to create_all
+search_metadata = MetaData()
+
+candidates_fts = Table(
+    "candidates_fts", search_metadata,
+    Column("rowid", Integer),
+    Column("name", String),
+    Column("rank", Float),
+)
+projects_fts = Table(
+    "projects_fts", search_metadata,
+    Column("rowid", Integer),
+    Column("title", String),
+    Column("rank", Float),
+)
+
+
+def match_query(text: str) -> Optional[str]:
+    """
+    FTS5 query matching rows where every token of `text` starts a token of the indexed text,
+    e.g. "ali sm" matches "Alice Smith". None when `text` has no searchable token.
+    """
+    # same separators as the unicode61 tokenizer, so tokens never need quoting
+    tokens = re.findall(r"[^\W_]+", text)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
@@ -0,0 +1,53 @@
+"""
+Response classes of the api
+"""
+import hashlib
+from typing import Any, Optional
+from urllib.parse import urlencode
+
+import orjson
+from pydantic import BaseModel
+from starlette import status
+from starlette.datastructures import QueryParams
+from starlette.responses import JSONResponse, Response
+
+
+class ORJSONModelResponse(JSONResponse):
+    """
+    JSON response for models which are already validated. Returned from an endpoint it skips the
+    validation and serialization FastAPI applies with `response_model`, which then only documents
+    the response, so the content has to be an instance of exactly that model.
+    Models are written by the pydantic-core serializer, faster than dumping them to dicts for orjson,
+    and any other content by orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return orjson.dumps(content)
+
+
+def row_etag(kind: str, id: int, version: int) -> str:
+    """
+    Strong ETag of one candidate or project, changes with the version stamped by every write to the row
+    """
+    return f'"{kind}-{id}-{version}"'
+
+def collection_etag(kind: str, version: int, query_params: QueryParams) -> str:
+    """
+    Strong ETag of a list page, changes with the version of the whole table and with the query
+    """
+    query = urlencode(sorted(query_params.multi_items()))
+    return f'"{kind}-{version}-{hashlib.sha256(query.encode()).hexdigest()[:16]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match lists one or more ETags, or * for any, and is compared ignoring the weak prefix
+    """
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
@@ -0,0 +1,137 @@
+"""
+Background worker pre-warming the special score cache for created/updated candidates
+"""
+import queue
+import threading
+from typing import List
+
+from takehome.config import settings
+from takehome.repository.database import get_db
+from takehome.repository.database_utils import get_candidates_after_id
+from takehome.utils import fetch_special_score, build_special_score_payload
+from takehome.logs import LOGGER
+
+_STOP = object()
+
+
+class ScoreWarmer:
+    """
+    Drains a bounded queue of special score payloads with a fixed number of worker threads,
+    so at most `concurrency` scorer calls are made by the warmer at any time.
+    """
+
+    def __init__(self, concurrency: int, max_queue_size: int):
+        self.concurrency = concurrency
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._threads: List[threading.Thread] = []
+        # skill sets already waiting in the queue, so concurrent reads of the same
+        # stale scores queue a single refresh
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def enqueue(self, payload: dict, refresh: bool = False, block: bool = False) -> bool:
+        """
+        Queues a payload for scoring, returns False if the payload was dropped
+        because the queue is full or the same skills are already queued
+        """
+        pending_key = (refresh, frozenset((skill['skill'], skill['score']) for skill in payload['skills']))
+        with self._pending_lock:
+            if pending_key in self._pending:
+                return False
+            self._pending.add(pending_key)
+        try:
+            self.queue.put((payload, refresh, pending_key), block=block)
+        except queue.Full:
+            LOGGER.warn("ScoreWarmer: queue full, dropping candidate %s", payload['candidate_id'])
+            with self._pending_lock:
+                self._pending.discard(pending_key)
+            return False
+        return True
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        LOGGER.info("ScoreWarmer: starting %s workers", self.concurrency)
+        self._stopping.clear()
+        for index in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"score-warmer-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = settings.SCORE_WORKER_STOP_TIMEOUT_SECONDS) -> None:
+        """
+        Drops the queued payloads and stops the workers, waiting at most `timeout` seconds
+        for each of them to finish its current scorer call
+        """
+        self._stopping.set()
+        self._drain()
+        for _ in self._threads:
+            try:
+                self.queue.put_nowait(_STOP)
+            except queue.Full:
+                # refilled by a concurrent enqueue, the workers return on their next item
+                break
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP:
+                with self._pending_lock:
+                    self._pending.discard(item[2])
+            self.queue.task_done()
+
+    def join(self) -> None:
+        """
+        Blocks until every queued payload has been processed
+        """
+        self.queue.join()
+
+    def _run(self) -> None:
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP or self._stopping.is_set():
+                    return
+                payload, refresh, pending_key = item
+                with self._pending_lock:
+                    self._pending.discard(pending_key)
+                fetch_special_score(payload, refresh=refresh)
+            except Exception as e:
+                LOGGER.warn("ScoreWarmer: failed to warm special score as %s", e)
+            finally:
+                self.queue.task_done()
+
+
+def rescore_all_candidates(batch_size: int = 500) -> int:
+    """
+    Refetches special scores of every candidate and rewrites the cache.
+    Args:
+        batch_size (int): Number of candidates read from the database at once.
+    Returns:
+        int: The number of candidates queued for scoring.
+    """
+    score_warmer.start()
+    total = 0
+    last_id = 0
+    while True:
+        with get_db() as db:
+            candidates = get_candidates_after_id(db, last_id, batch_size)
+        if not candidates:
+            break
+        for candidate in candidates:
+            score_warmer.enqueue(build_special_score_payload(candidate), refresh=True, block=True)
+        total += len(candidates)
+        last_id = candidates[-1].id
+        LOGGER.info("ScoreWarmer: queued %s candidates for re-scoring", total)
+    score_warmer.join()
+    return total
+
+
+score_warmer = ScoreWarmer(settings.SCORE_WORKER_CONCURRENCY, settings.SCORE_WORKER_QUEUE_SIZE)
@@ -0,0 +1,158 @@
+"""
+Client for the flaky special score api, guarded by a circuit breaker and process wide
+concurrency and rate limits shared by every request and background worker
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+from takehome.config import settings
+from takehome.logs import LOGGER
+
+
+class ScorerUnavailableError(Exception):
+    """
+    Raised when special scores could not be fetched, either because the circuit is open
+    or because every retry failed
+    """
+
+
+class CircuitBreaker:
+    """
+    A thread safe circuit breaker over a rolling window of the latest call outcomes.
+
+    closed: calls are allowed, the circuit opens once the failure rate of the window
+            reaches `failure_rate` (with at least `min_calls` outcomes recorded)
+    open: calls are rejected until `reset_timeout` seconds have passed
+    half_open: a single trial call is allowed, its outcome closes or re-opens the circuit
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window_size: int, min_calls: int, failure_rate: float, reset_timeout: float):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._outcomes: deque = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                LOGGER.info("CircuitBreaker: trial call succeeded, closing circuit")
+                self.state = self.CLOSED
+                self._outcomes.clear()
+                self._trial_in_flight = False
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                    and failures / len(self._outcomes) >= self.failure_rate):
+                self._open()
+
+    def _open(self) -> None:
+        LOGGER.warn("CircuitBreaker: failure rate too high, opening circuit")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket refilled at `rate` tokens per second up to `capacity`.
+    Callers reserve tokens in arrival order and sleep until their token is due,
+    so waiting callers are served first come first served.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            # tokens may go negative, which reserves a future token for this caller
+            self._tokens -= 1
+            wait_time = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+scorer_circuit_breaker = CircuitBreaker(settings.CIRCUIT_BREAKER_WINDOW_SIZE,
+                                        settings.CIRCUIT_BREAKER_MIN_CALLS,
+                                        settings.CIRCUIT_BREAKER_FAILURE_RATE,
+                                        settings.CIRCUIT_BREAKER_RESET_SECONDS)
+scorer_rate_limiter = TokenBucket(settings.SCORER_RATE_LIMIT_PER_SECOND, settings.SCORER_RATE_LIMIT_BURST)
+# bounds upstream calls made at once, whichever thread they come from
+scorer_in_flight = threading.BoundedSemaphore(settings.SCORER_MAX_IN_FLIGHT)
+# shared by every request fetching scores in parallel, instead of a pool per request
+scorer_executor = ThreadPoolExecutor(max_workers=settings.SCORER_EXECUTOR_WORKERS, thread_name_prefix="scorer")
+
+
+#calls mock server api with retries, returns special scores in the order of payload skills
+def request_special_scores(payload: dict) -> List[float]:
+    candidate_id = payload['candidate_id']
+    max_retries = settings.SCORER_MAX_RETRIES
+
+    for attempt in range(max_retries):
+        if not scorer_circuit_breaker.allow_request():
+            LOGGER.warn("Circuit open, not fetching score for candidate %s", candidate_id)
+            raise ScorerUnavailableError(f"Special score service unavailable for candidate {candidate_id}")
+        try:
+            scorer_rate_limiter.acquire()
+            with scorer_in_flight:
+                response = requests.post(url=settings.MOCK_FLAKY_ENDPOINT, json=payload,
+                                         timeout=settings.SCORER_TIMEOUT_SECONDS).json()
+            success_flag = response.get("success", False)
+
+            if not success_flag:
+                raise Exception(response.get("error_log") or response)
+
+            special_scores = response.get("special_scores", [])
+            if len(special_scores) != len(payload.get("skills", [])):
+                raise Exception("special scores do not match the requested skills")
+
+            scorer_circuit_breaker.record_success()
+            return special_scores
+
+        except Exception as e:
+            scorer_circuit_breaker.record_failure()
+            LOGGER.warn("Attempt %s: Failed as %s to fetch score for candidate %s. Retrying...", attempt + 1, e, candidate_id)
+            if attempt + 1 < max_retries:
+                time.sleep(settings.SCORER_RETRY_DELAY_SECONDS)
+
+    LOGGER.error("Failed to fetch score for candidate %s after %s retries.", candidate_id, max_retries)
+    raise ScorerUnavailableError(f"Failed to fetch score for candidate {candidate_id} after {max_retries} retries.")
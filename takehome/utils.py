@@ -1,19 +1,26 @@
-from typing import List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from collections import deque
 from itertools import combinations
 from fastapi import HTTPException, status
-import requests
+from starlette.concurrency import run_in_threadpool
+import asyncio
 import time
 import json
-from concurrent.futures import ThreadPoolExecutor
+import hashlib
 
 from takehome.repository.database_models import CandidateDB, ProjectDB
+from takehome.repository.database import AsyncSessionLocal, get_db
+from takehome.repository.database_utils import get_stored_special_scores, save_special_scores_db, stream_candidates
 from takehome.models import FormTeamCandidateResponse, FormTeamResponse, FormTeamScore, CandidateDictSkills
+from takehome.models import CandidateResponse, SkillResponse
 from takehome.config import settings
-from takehome.cache import redis_client
-from takehome.constants import SPECIAL_SCORE_REDIS_KEY
+from takehome.cache import score_cache
+from takehome.scorer import ScorerUnavailableError, request_special_scores, scorer_executor
+from takehome.constants import SPECIAL_SCORE_REDIS_KEY, SCORE_STATUS_PENDING
 from takehome.logs import LoggingContext, LOGGER
 
-#calculate coverage, expertise and assigned skills for a given set of candidates with respect to required_skills
+#calculate coverage, expertise and assigned skills for a given set of candidates with respect to required_skills,
+#skills are keyed by skill id
 def calculate_team_coverage(team: List[CandidateDictSkills], required_skills: dict):
     skills_covered = {}
     total_expertise = 0
@@ -22,12 +29,12 @@ def calculate_team_coverage(team: List[CandidateDictSkills], required_skills: di
 
     for candidate in team:
         candidate_skills = candidate.skills
-        for skill_name in candidate_skills.keys():
-            expertise = candidate_skills[skill_name]
-            if skill_name in required_skills.keys() and expertise >= required_skills[skill_name]:
-                if skill_name not in skills_covered or expertise > skills_covered[skill_name]:
-                    skills_covered[skill_name] = expertise
-                    skill_match[candidate.id].append(skill_name)
+        for skill_id in candidate_skills.keys():
+            expertise = candidate_skills[skill_id]
+            if skill_id in required_skills.keys() and expertise >= required_skills[skill_id]:
+                if skill_id not in skills_covered or expertise > skills_covered[skill_id]:
+                    skills_covered[skill_id] = expertise
+                    skill_match[candidate.id].append(skill_id)
     
     total_expertise = sum(skills_covered.values())
     coverage = len(skills_covered.keys()) / len(required_skills.keys())
@@ -39,13 +46,13 @@ def filter_candidates_and_skills(required_skills, candidates: List[CandidateDB])
     filtered_candidates = []
     for candidate in candidates:
         is_any_useful_skill = False
-        candidate_skills = {skill.name: skill.expertise_level for skill in candidate.skills}
+        candidate_skills = {skill.skill_id: skill.expertise_level for skill in candidate.skills}
         candidate_skill_keys = list(candidate_skills.keys())
-        for skill_name in candidate_skill_keys:
-            if skill_name not in required_skills.keys():
-                candidate_skills.pop(skill_name)
-            elif required_skills[skill_name] > candidate_skills[skill_name]:
-                candidate_skills.pop(skill_name)
+        for skill_id in candidate_skill_keys:
+            if skill_id not in required_skills.keys():
+                candidate_skills.pop(skill_id)
+            elif required_skills[skill_id] > candidate_skills[skill_id]:
+                candidate_skills.pop(skill_id)
             else:
                 is_any_useful_skill = True
         if is_any_useful_skill:
@@ -65,8 +72,8 @@ def filter_better_candidates(candidates: List[CandidateDictSkills]) -> List[Cand
             is_j_better=True
             i_skills = candidates[i].skills
             j_skills = candidates[j].skills
-            for skill_name in i_skills.keys():
-                if (skill_name not in j_skills.keys() ) or (j_skills[skill_name] < i_skills[skill_name] ):
+            for skill_id in i_skills.keys():
+                if (skill_id not in j_skills.keys() ) or (j_skills[skill_id] < i_skills[skill_id] ):
                     is_j_better = False 
                 
             if is_j_better:
@@ -78,15 +85,14 @@ def filter_better_candidates(candidates: List[CandidateDictSkills]) -> List[Cand
     return filtered_candidates
 
 
-def form_team_helper(team_size: int, candidates_db: List[CandidateDB], project: ProjectDB, local_logging_context: LoggingContext) -> FormTeamResponse:
+#CPU bound search over every team of team_size, run off the event loop
+def find_best_team(team_size: int, candidates_db: List[CandidateDB], required_skills: dict) -> Tuple[Optional[tuple], float, int, Dict[int, List[str]]]:
 
     best_team = None  # List[CandidateDictSkills]
     best_coverage = 0
     best_expertise = 0
     best_skill_match = {}
 
-    required_skills = { skill.name: skill.expertise_level  for skill in project.skills}
-
     #filtering candidates
     filtered_candidates: List[CandidateDictSkills] = filter_candidates_and_skills(required_skills, candidates_db)
     filtered_candidates: List[CandidateDictSkills] = filter_better_candidates(filtered_candidates)
@@ -99,7 +105,16 @@ def form_team_helper(team_size: int, candidates_db: List[CandidateDB], project:
             best_coverage = coverage
             best_expertise = expertise
             best_skill_match = skill_match
-    
+    return best_team, best_coverage, best_expertise, best_skill_match
+
+
+async def form_team_helper(team_size: int, candidates_db: List[CandidateDB], project: ProjectDB, local_logging_context: LoggingContext) -> FormTeamResponse:
+
+    required_skills = { skill.skill_id: skill.expertise_level  for skill in project.skills}
+    skill_names = { skill.skill_id: skill.name for skill in project.skills}
+    best_team, best_coverage, best_expertise, best_skill_match = await run_in_threadpool(
+        find_best_team, team_size, candidates_db, required_skills)
+
     if not best_team:
         LOGGER.warn("Could not form the best team", extra=local_logging_context.store)
         raise HTTPException(
@@ -110,24 +125,21 @@ def form_team_helper(team_size: int, candidates_db: List[CandidateDB], project:
     candidate_response = []
     special_score_payload = []
     for candidate in best_team:
-        assigned_skills = best_skill_match.get(candidate.id, [])
+        assigned_skills = [skill_names[skill_id] for skill_id in best_skill_match.get(candidate.id, [])]
         tmp_response = FormTeamCandidateResponse(candidate_id=candidate.id, name=candidate.name,
                             assigned_skills=assigned_skills, special_score=[])
         candidate_response.append(tmp_response)
 
-        cur_special_score_payload = {'candidate_id': str(candidate.id)}
-        cur_special_score_payload['skills']=[]
         candidate_db=None
         for tmp_candidate in candidates_db:
             if tmp_candidate.id == candidate.id:
                 candidate_db = tmp_candidate
-        for skill in candidate_db.skills:
-            cur_special_score_payload['skills'].append({'skill': skill.name, 'score': skill.expertise_level})
-        special_score_payload.append(cur_special_score_payload)
+        special_score_payload.append(build_special_score_payload(candidate_db))
     LOGGER.info("Created a optimal team", extra=local_logging_context.store)
     
-    LOGGER.info(f"Fetching special scores for payload {special_score_payload}", extra=local_logging_context.store)
-    special_scores = fetch_parallel_scores(special_score_payload)
+    LOGGER.info("Fetching special scores for %s candidates", len(special_score_payload), extra=local_logging_context.store)
+    LOGGER.debug("Special score payload %s", special_score_payload, extra=local_logging_context.store)
+    special_scores = await fetch_parallel_scores(special_score_payload)
     for candidate in candidate_response:
         special_score = special_scores[str(candidate.candidate_id)]
         for skill_name in special_score.keys():
@@ -137,47 +149,190 @@ def form_team_helper(team_size: int, candidates_db: List[CandidateDB], project:
     response = FormTeamResponse(team=candidate_response, coverage=best_coverage, total_expertise=best_expertise)
     return response
 
-#using ThreadPoolExecutor to call multiple calls at once
-def fetch_parallel_scores(payloads: List[dict]) -> List[dict]:
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(fetch_special_score, payloads))
-    
-    candidate_ids = [payload['candidate_id'] for payload in payloads]
-    return dict(zip(candidate_ids, results))
+#payload expected by the special score api, works for both CandidateDB and Candidate objects
+def build_special_score_payload(candidate) -> dict:
+    return {
+        'candidate_id': str(candidate.id),
+        'skills': [{'skill': skill.name, 'score': skill.expertise_level} for skill in candidate.skills],
+    }
+
+#runs fetch_special_score on the shared scorer executor and awaits it without blocking the event loop
+def submit_special_score(payload: dict) -> asyncio.Future:
+    return asyncio.wrap_future(scorer_executor.submit(fetch_special_score, payload))
+
+#using the shared scorer executor to call multiple calls at once, a request keeps at most
+#SCORER_MAX_PENDING_PER_REQUEST calls queued so large pages cannot starve other requests.
+#Scores are added to special_scores as soon as each call finishes
+async def fetch_parallel_scores(payloads: List[dict], special_scores: Optional[dict] = None) -> dict:
+    special_scores = {} if special_scores is None else special_scores
+    pending = {}
+    try:
+        for payload in payloads:
+            if len(pending) >= settings.SCORER_MAX_PENDING_PER_REQUEST:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    candidate_id = pending.pop(future)
+                    special_scores[candidate_id] = future.result()
+            pending[submit_special_score(payload)] = payload['candidate_id']
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                candidate_id = pending.pop(future)
+                special_scores[candidate_id] = future.result()
+    except BaseException:
+        #a failed or cancelled request leaves its other calls running, nobody awaits them any more
+        for future in pending:
+            future.add_done_callback(_log_abandoned_scores)
+        raise
+    return special_scores
+
+#like fetch_parallel_scores but returns once deadline (seconds) is reached, candidates whose
+#scores are not ready map to None while the remaining calls keep running in the background,
+#within the same per request cap, and fill the cache
+async def fetch_scores_with_deadline(payloads: List[dict], deadline: float) -> dict:
+    special_scores = {payload['candidate_id']: None for payload in payloads}
+    if not payloads:
+        return special_scores
+    scores_task = asyncio.ensure_future(fetch_parallel_scores(payloads, special_scores))
+    try:
+        await asyncio.wait_for(asyncio.shield(scores_task), timeout=deadline)
+    except asyncio.TimeoutError:
+        scores_task.add_done_callback(_log_abandoned_scores)
+    #the background calls keep writing to special_scores
+    return dict(special_scores)
+
+#consumes the outcome of scorer calls a request stopped waiting for,
+#asyncio would otherwise report their failures as never retrieved
+def _log_abandoned_scores(future: asyncio.Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        LOGGER.warn("Special score fetch failed after its request stopped waiting: %s", future.exception())
+
+#special_score is None while scores of the candidate are pending
+def build_candidate_response(candidate, special_score: Optional[dict]) -> CandidateResponse:
+    if special_score is None:
+        skills = [SkillResponse(name=skill.name, expertise_level=skill.expertise_level, special_score=None)
+                  for skill in candidate.skills]
+        return CandidateResponse(id=candidate.id, name=candidate.name, skills=skills, score_status=SCORE_STATUS_PENDING)
+
+    skills = [SkillResponse(name=skill.name, expertise_level=skill.expertise_level, special_score=special_score[skill.name])
+              for skill in candidate.skills]
+    return CandidateResponse(id=candidate.id, name=candidate.name, skills=skills)
+
+#NDJSON lines of every candidate with their special scores, ordered by id. Scores of the last
+#EXPORT_SCORE_WINDOWS batches are fetched concurrently while the oldest batch is written, so memory
+#is bounded by the windows whatever the table size. Uses its own session as the body is streamed
+#after the request handler returned
+async def export_candidates_ndjson() -> AsyncIterator[bytes]:
+    windows = deque()
+    try:
+        async with AsyncSessionLocal() as db:
+            async for candidates in stream_candidates(db, settings.EXPORT_BATCH_SIZE):
+                payloads = [build_special_score_payload(candidate) for candidate in candidates]
+                special_scores = {payload['candidate_id']: None for payload in payloads}
+                scores_task = asyncio.ensure_future(fetch_parallel_scores(payloads, special_scores))
+                windows.append((candidates, special_scores, scores_task))
+                if len(windows) >= settings.EXPORT_SCORE_WINDOWS:
+                    yield await _export_window(*windows.popleft())
+        while windows:
+            yield await _export_window(*windows.popleft())
+    finally:
+        #the client went away, the scores already requested still fill the cache
+        for _, _, scores_task in windows:
+            scores_task.cancel()
+
+#the status line is sent before the first batch, a scorer failure can no longer turn the export
+#into an error, so candidates without scores are written as pending like the deadline mode does
+async def _export_window(candidates: List[CandidateDB], special_scores: dict, scores_task: asyncio.Future) -> bytes:
+    try:
+        await scores_task
+    except ScorerUnavailableError as error:
+        LOGGER.warn("Exporting candidates without special scores as %s", error)
+    return b"".join(build_candidate_response(candidate, special_scores[str(candidate.id)]).model_dump_json().encode() + b"\n"
+                    for candidate in candidates)
+
+#cache key for the special score of a single (skill, expertise_level) tuple,
+#identical skill tuples share one cache entry across all candidates
+def special_score_key(skill_name: str, expertise_level: int) -> str:
+    digest = hashlib.sha256(json.dumps([skill_name, expertise_level]).encode()).hexdigest()
+    return SPECIAL_SCORE_REDIS_KEY.format(digest)
+
+#reads special scores through the in-process L1 cache, redis and the scores persisted in database,
+#and calls mock server api only for skills missing in all of them.
+#Expired scores are served stale while a background refresh is queued.
+#refresh=True skips every cache tier and refetches every skill
+def fetch_special_score( payload: dict, refresh: bool = False) -> dict:
+    LOGGER.debug("fetching special score for payload %s", payload)
 
-#calls mock server api to fetch special score and store in redis
-def fetch_special_score( payload: dict) -> float:
-    LOGGER.debug(f"fetching special score for payload {payload}")
-    
     candidate_id = int(payload['candidate_id'])
-    cached_output = redis_client.get(SPECIAL_SCORE_REDIS_KEY.format(candidate_id))
-    if cached_output:
-        return json.loads(cached_output)
-    max_retries = 5
-    retry_delay = 2  # seconds
-
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(url=settings.MOCK_FLAKY_ENDPOINT, data=json.dumps(payload)).json()
-            success_flag = response.get("success", False)
-
-            if not success_flag:
-                raise Exception
-
-            special_scores = response.get("special_scores", [])
-            if len(special_scores) != len(payload.get("skills", [])):
-                raise Exception
-
-            skills_score_map = {}
-            for index, skill in enumerate(payload.get("skills", [])):
-                skills_score_map[skill['skill']] = special_scores[index]
-            
-            redis_client.set(SPECIAL_SCORE_REDIS_KEY.format(candidate_id), json.dumps(skills_score_map), ex=86400)   # ex=86400 -> 1 day expiry
-            return skills_score_map
-
-        except Exception as e:
-            LOGGER.warn(f"Attempt {attempt + 1}: Failed as {e} to fetch score for candidate {candidate_id}. Retrying...")
-            time.sleep(retry_delay)
-
-    LOGGER.error(f"Failed to fetch score for candidate {candidate_id} after {max_retries} retries.")
-    raise Exception(f"Failed to fetch score for candidate {candidate_id} after {max_retries} retries.")
\ No newline at end of file
+    skills = payload.get("skills", [])
+    cache_ex = settings.SPECIAL_SCORE_TTL_SECONDS + settings.SPECIAL_SCORE_STALE_TTL_SECONDS
+    if refresh:
+        cached_outputs = [None] * len(skills)
+    else:
+        cache_keys = [special_score_key(skill['skill'], skill['score']) for skill in skills]
+        cached_outputs = score_cache.get_many(cache_keys)
+
+    now = time.time()
+    skills_score_map = {}
+    missing_skills = []
+    stale_skills = []
+    for skill, cached_output in zip(skills, cached_outputs):
+        if cached_output is None:
+            missing_skills.append(skill)
+            continue
+        cached_score = json.loads(cached_output)
+        skills_score_map[skill['skill']] = cached_score['score']
+        if cached_score['fresh_until'] <= now:
+            stale_skills.append(skill)
+
+    #second tier, scores persisted in database survive restarts and redis evictions
+    if missing_skills and not refresh:
+        with get_db() as db:
+            stored_scores = get_stored_special_scores(db, candidate_id)
+        restored_scores = {}
+        still_missing_skills = []
+        for skill in missing_skills:
+            stored_score = stored_scores.get((skill['skill'], skill['score']))
+            if stored_score is None:
+                still_missing_skills.append(skill)
+                continue
+            special_score, fresh_until = stored_score
+            skills_score_map[skill['skill']] = special_score
+            restored_scores[special_score_key(skill['skill'], skill['score'])] = json.dumps(
+                {'score': special_score, 'fresh_until': fresh_until})
+            if fresh_until <= now:
+                stale_skills.append(skill)
+        if restored_scores:
+            score_cache.set_many(restored_scores, ex=cache_ex)
+        missing_skills = still_missing_skills
+
+    if stale_skills:
+        _schedule_refresh({'candidate_id': payload['candidate_id'], 'skills': stale_skills})
+    if not missing_skills:
+        return skills_score_map
+
+    request_payload = {'candidate_id': payload['candidate_id'], 'skills': missing_skills}
+    special_scores = request_special_scores(request_payload)
+
+    fresh_until = now + settings.SPECIAL_SCORE_TTL_SECONDS
+    fetched_scores = {}
+    persisted_scores = {}
+    for skill, special_score in zip(missing_skills, special_scores):
+        skills_score_map[skill['skill']] = special_score
+        fetched_scores[special_score_key(skill['skill'], skill['score'])] = json.dumps(
+            {'score': special_score, 'fresh_until': fresh_until})
+        persisted_scores[(skill['skill'], skill['score'])] = special_score
+
+    with get_db() as db:
+        save_special_scores_db(db, candidate_id, persisted_scores, fresh_until)
+    #redis keeps the entry past its freshness so it can still be served stale,
+    #a refresh replaces entries other instances hold in their L1 and asks them to evict those
+    score_cache.set_many(fetched_scores, ex=cache_ex, broadcast=refresh)
+    return skills_score_map
+
+def _schedule_refresh(payload: dict) -> None:
+    #imported here as score_worker depends on this module
+    from takehome.score_worker import score_warmer
+    LOGGER.debug("queueing refresh of stale special scores for candidate %s", payload['candidate_id'])
+    score_warmer.enqueue(payload, refresh=True)
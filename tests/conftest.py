@@ -0,0 +1,4 @@
+import os
+
+# tests run without a redis server
+os.environ.setdefault("CACHE_BACKEND", "memory")
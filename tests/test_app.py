@@ -1,8 +1,17 @@
+import asyncio
+import json
+import threading
+import time
+
 import pytest
 from httpx import AsyncClient, ASGITransport
 
-from takehome.repository.database import Base, engine
+from takehome.repository.database import Base, SessionLocal, engine
 from takehome.app import app
+from takehome.authy import LoginThrottle
+from takehome.config import settings
+from takehome.scorer import ScorerUnavailableError
+from takehome.candidate_store import CandidateStore
 from tests.test_helper import project_object1, project_object2, candidate_object1
 from tests.test_helper import candidate_object2
 
@@ -46,6 +55,40 @@ async def test_create_project_login_failed():
         response = await ac.post("/project/", json=project_object1, headers=headers)
     assert response.status_code == 401
 
+@pytest.mark.asyncio
+async def test_login_throttled(monkeypatch):
+    monkeypatch.setattr("takehome.app.login_throttle", LoginThrottle(max_failures=5, window_seconds=300))
+    payload = {"username": "pradeep", "password": "guess"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for _ in range(5):
+            response = await ac.post("/token", data=payload)
+            assert response.status_code == 401
+        response = await ac.post("/token", data=payload)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+
+@pytest.mark.asyncio
+async def test_login_throttled_concurrent_attempts(monkeypatch):
+    monkeypatch.setattr("takehome.app.login_throttle", LoginThrottle(max_failures=5, window_seconds=300))
+    payload = {"username": "pradeep", "password": "guess"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        # every attempt is counted before its password is hashed, not once the hash failed
+        responses = await asyncio.gather(*(ac.post("/token", data=payload) for _ in range(10)))
+    assert sorted(response.status_code for response in responses) == [401] * 5 + [429] * 5
+
+@pytest.mark.asyncio
+async def test_login_throttled_unknown_usernames(monkeypatch):
+    monkeypatch.setattr("takehome.app.login_throttle", LoginThrottle(max_failures=5, window_seconds=300, max_usernames=2))
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        for _ in range(5):
+            await ac.post("/token", data={"username": "pradeep", "password": "guess"})
+        # made up usernames are not tracked, they cannot evict the throttled one
+        for username in ["intruder1", "intruder2", "intruder3"]:
+            response = await ac.post("/token", data={"username": username, "password": "guess"})
+            assert response.status_code == 401
+        response = await ac.post("/token", data={"username": "pradeep", "password": "tmp@123"})
+    assert response.status_code == 429
+
 @pytest.mark.asyncio
 async def test_create_project_duplicate(login_token):
     headers = {"Authorization": f"Bearer {await login_token}"}
@@ -131,6 +174,16 @@ async def test_create_candidate_duplicate(login_token):
     assert response.status_code == 400
     assert response.json() == {'detail': 'Invalid Request, candidate already exists'}
 
+@pytest.mark.asyncio
+async def test_create_candidate_duplicate_skill(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    candidate = {"name": "Duplicate Skills", "skills": [{"name": "Python", "expertise_level": 5},
+                                                       {"name": "Python", "expertise_level": 7}]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/candidate/", json=candidate, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, skill names must be unique'}
+
 @pytest.mark.asyncio
 async def test_get_candidate_invalid(login_token):
     headers = {"Authorization": f"Bearer {await login_token}"}
@@ -140,6 +193,15 @@ async def test_get_candidate_invalid(login_token):
     assert response.status_code == 400
     assert response.json() == {'detail': 'Invalid Request, Candidate with provided id does not exists'}
 
+@pytest.mark.asyncio
+async def test_get_candidate_invalid_deadline(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {"id": 1, "deadline_ms": 0}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/candidate/", params = params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, deadline_ms must be greater than 0'}
+
 @pytest.mark.asyncio
 async def test_update_candidate(login_token):
     headers = {"Authorization": f"Bearer {await login_token}"}
@@ -225,6 +287,328 @@ async def test_get_projects_order_desc(login_token):
     assert response.json()['size'] == 2
     assert response.json()['projects'][0]['id'] == 2
 
+@pytest.mark.asyncio
+async def test_get_candidates_batch_missing_ids(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {"ids": [9998, 9999]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/candidates/batch", params = params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, Candidates with ids 9998, 9999 do not exist'}
+
+@pytest.mark.asyncio
+async def test_export_candidates(login_token, monkeypatch):
+    monkeypatch.setattr("takehome.utils.fetch_special_score",
+                        lambda payload: {skill['skill']: skill['score'] / 2 for skill in payload['skills']})
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.post("/candidate/", json={"name": "Exported", "skills": [{"name": "Go", "expertise_level": 4}]}, headers=headers)
+        response = await ac.get("/candidates/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    candidates = [json.loads(line) for line in response.text.splitlines()]
+    assert [candidate['id'] for candidate in candidates] == sorted(candidate['id'] for candidate in candidates)
+    assert {"id": candidates[-1]['id'], "name": "Exported", "score_status": "ready",
+            "skills": [{"name": "Go", "expertise_level": 4, "special_score": 2.0}]} in candidates
+
+@pytest.mark.asyncio
+async def test_patch_candidates_skills(login_token, monkeypatch):
+    monkeypatch.setattr("takehome.utils.fetch_special_score",
+                        lambda payload: {skill['skill']: skill['score'] / 2 for skill in payload['skills']})
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        candidate_ids = []
+        for name in ["Patched 1", "Patched 2"]:
+            response = await ac.post("/candidate/", json={"name": name, "skills": [{"name": "Go", "expertise_level": 4},
+                                                                                    {"name": "Rust", "expertise_level": 2}]}, headers=headers)
+            candidate_ids.append(response.json()['id'])
+        items = [
+            {"id": candidate_ids[0], "upsert": [{"name": "Go", "expertise_level": 6}, {"name": "Zig", "expertise_level": 1}],
+             "remove": ["Rust", "Cobol"]},
+            {"id": candidate_ids[1], "remove": ["Go"]},
+        ]
+        response = await ac.patch("/candidates/skills", json={"items": items}, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == {"updated": 2}
+        response = await ac.get("/candidates/batch", params={"ids": candidate_ids}, headers=headers)
+    skills = [[(skill['name'], skill['expertise_level']) for skill in candidate['skills']]
+              for candidate in response.json()['candidates']]
+    assert skills == [[("Go", 6), ("Zig", 1)], [("Rust", 2)]]
+
+@pytest.mark.asyncio
+async def test_patch_candidates_skills_invalid(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.patch("/candidates/skills", json={"items": [{"id": 9999, "remove": ["Go"]}]}, headers=headers)
+        assert response.status_code == 400
+        assert response.json() == {'detail': 'Invalid Request, Candidates with ids 9999 do not exist'}
+        response = await ac.patch("/candidates/skills", json={"items": [
+            {"id": 1, "upsert": [{"name": "Go", "expertise_level": 3}], "remove": ["Go"]}]}, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, skill names must be unique'}
+
+@pytest.mark.asyncio
+async def test_import_candidates_ndjson(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}", "Content-Type": "application/x-ndjson"}
+    content = "\n".join([
+        '{"name": "Import 1", "skills": [{"name": "Python", "expertise_level": 5}]}',
+        '{"name": "Import 1", "skills": []}',
+        '{"name": "Import 2", "skills": [{"name": "Python", "expertise_level": 11}]}',
+        'not json',
+        '{"name": "Import 3", "skills": [{"name": "SQL", "expertise_level": 3}]}',
+    ])
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/candidates/import", content=content, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['inserted'] == 2
+    assert response.json()['failed'] == 3
+    assert [error['line'] for error in response.json()['errors']] == [2, 3, 4]
+
+@pytest.mark.asyncio
+async def test_import_projects_csv(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}", "Content-Type": "text/csv"}
+    content = "title,skills\nImported project,Python:7;SQL:5\nEmpty project,\n"
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.post("/projects/import", content=content, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {"inserted": 2, "failed": 0, "errors": []}
+
+@pytest.mark.asyncio
+async def test_get_projects_cursor(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {'size': 1, 'sort_by': 'title'}
+    titles = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        while True:
+            response = await ac.get("/projects/", params = params, headers=headers)
+            assert response.status_code == 200
+            titles.extend(project['title'] for project in response.json()['projects'])
+            if not response.json()['next_cursor']:
+                break
+            params['cursor'] = response.json()['next_cursor']
+
+        params['cursor'] = response.json()['prev_cursor']
+        response = await ac.get("/projects/", params = params, headers=headers)
+    assert titles == sorted(titles)
+    assert len(titles) == len(set(titles))
+    assert response.json()['projects'][0]['title'] == titles[-2]
+
+@pytest.mark.asyncio
+async def test_get_projects_cursor_mismatch(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/projects/", params = {'size': 1}, headers=headers)
+        params = {'size': 1, 'order': 'desc', 'cursor': response.json()['next_cursor']}
+        response = await ac.get("/projects/", params = params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, cursor does not match sort_by and order'}
+
+@pytest.mark.asyncio
+async def test_get_projects_skill_filters(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        params = {'size': 1, 'skills': ['JavaScript:8', 'Python']}
+        response = await ac.get("/projects/", params = params, headers=headers)
+        assert response.status_code == 200
+        assert response.json()['size'] == 1
+        assert response.json()['total'] == 2
+
+        params = {'size': 10, 'skills': ['Python:7', 'SQL:1-5', 'DevOps']}
+        response = await ac.get("/projects/", params = params, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['total'] == 1
+    assert [project['title'] for project in response.json()['projects']] == [project_object1['title']]
+
+@pytest.mark.asyncio
+async def test_get_projects_invalid_skill_filter(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {'size': 10, 'skills': 'Python:9-7'}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/projects/", params = params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, skill filter Python:9-7 must look like Python, Python:7 or Python:5-8'}
+
+@pytest.mark.asyncio
+async def test_get_projects_search(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        params = {'size': 10, 'title': 'full st'}
+        response = await ac.get("/projects/", params = params, headers=headers)
+        assert response.status_code == 200
+        assert [project['title'] for project in response.json()['projects']] == [project_object1['title']]
+
+        params = {'size': 10, 'title': 'proj', 'sort_by': 'relevance'}
+        response = await ac.get("/projects/", params = params, headers=headers)
+        assert response.status_code == 200
+        ranked_titles = [project['title'] for project in response.json()['projects']]
+        assert response.json()['total'] == len(ranked_titles) == 3
+
+        # walking the relevance order one project at a time gives the same order
+        params['size'] = 1
+        titles = []
+        while True:
+            response = await ac.get("/projects/", params = params, headers=headers)
+            titles.extend(project['title'] for project in response.json()['projects'])
+            if not response.json()['next_cursor']:
+                break
+            params['cursor'] = response.json()['next_cursor']
+    assert titles == ranked_titles
+
+@pytest.mark.asyncio
+async def test_get_projects_relevance_without_title(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {'size': 10, 'sort_by': 'relevance'}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/projects/", params = params, headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {'detail': 'Invalid Request, sort_by relevance requires title'}
+
+@pytest.mark.asyncio
+async def test_get_project_etag(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        project_id = (await ac.post("/project/", json={"title": "Polled project", "skills": []}, headers=headers)).json()['id']
+        response = await ac.get("/project/", params={"id": project_id}, headers=headers)
+        etag = response.headers["etag"]
+        response = await ac.get("/project/", params={"id": project_id}, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+        await ac.patch("/projects/skills", json={"items": [{"id": project_id, "upsert": [{"name": "Go", "expertise_level": 3}]}]},
+                       headers=headers)
+        response = await ac.get("/project/", params={"id": project_id}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()['skills'] == [{"name": "Go", "expertise_level": 3}]
+
+@pytest.mark.asyncio
+async def test_get_projects_etag(login_token):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    params = {"size": 2}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        etag = (await ac.get("/projects/", params=params, headers=headers)).headers["etag"]
+        response = await ac.get("/projects/", params=params, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        response = await ac.get("/projects/", params={"size": 3}, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+
+        project_id = (await ac.post("/project/", json={"title": "Deleted project", "skills": []}, headers=headers)).json()['id']
+        await ac.delete("/project/", params={"id": project_id}, headers=headers)
+        response = await ac.get("/projects/", params=params, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+@pytest.mark.asyncio
+async def test_get_candidate_deadline_pending(login_token, monkeypatch):
+    scorer_calls = []
+    def slow_request_special_scores(payload):
+        scorer_calls.append(payload)
+        time.sleep(0.5)
+        return [1.5 for _ in payload['skills']]
+    monkeypatch.setattr("takehome.utils.request_special_scores", slow_request_special_scores)
+
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    candidate = {"name": "Slow Scorer", "skills": [{"name": "Fortran", "expertise_level": 3}]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        candidate_id = (await ac.post("/candidate/", json=candidate, headers=headers)).json()['id']
+        params = {"id": candidate_id, "deadline_ms": 100}
+        response = await ac.get("/candidate/", params=params, headers=headers)
+        assert response.status_code == 200
+        assert response.json()['score_status'] == "pending"
+        assert response.json()['skills'] == [{"name": "Fortran", "expertise_level": 3, "special_score": None}]
+
+        # the scorer call keeps running after the deadline and fills the cache
+        await asyncio.sleep(0.6)
+        response = await ac.get("/candidate/", params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.json()['score_status'] == "ready"
+    assert response.json()['skills'] == [{"name": "Fortran", "expertise_level": 3, "special_score": 1.5}]
+    assert len(scorer_calls) == 1
+
+@pytest.mark.asyncio
+async def test_get_candidate_etag(login_token, monkeypatch):
+    scorer_released = threading.Event()
+    def blocked_request_special_scores(payload):
+        scorer_released.wait(timeout=5)
+        return [2.5 for _ in payload['skills']]
+    monkeypatch.setattr("takehome.utils.request_special_scores", blocked_request_special_scores)
+
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    candidate = {"name": "Etag Candidate", "skills": [{"name": "Cobol", "expertise_level": 4}]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        candidate_id = (await ac.post("/candidate/", json=candidate, headers=headers)).json()['id']
+        response = await ac.get("/candidate/", params={"id": candidate_id, "deadline_ms": 50}, headers=headers)
+        assert response.json()['score_status'] == "pending"
+        assert "etag" not in response.headers
+
+        scorer_released.set()
+        response = await ac.get("/candidate/", params={"id": candidate_id}, headers=headers)
+        assert response.json()['score_status'] == "ready"
+        etag = response.headers["etag"]
+        response = await ac.get("/candidate/", params={"id": candidate_id}, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304
+
+        # sqlite hands the id of the deleted last row to the next row, the new row must not match the old etag
+        await ac.delete("/candidate/", params={"id": candidate_id}, headers=headers)
+        reused = {"name": "Reused Etag Candidate", "skills": [{"name": "Cobol", "expertise_level": 4}]}
+        assert (await ac.post("/candidate/", json=reused, headers=headers)).json()['id'] == candidate_id
+        response = await ac.get("/candidate/", params={"id": candidate_id}, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()['name'] == "Reused Etag Candidate"
+
+@pytest.mark.asyncio
+async def test_candidate_store_follows_writes(login_token, monkeypatch):
+    # a store of its own, the global one stays unloaded for the other tests
+    candidate_store = CandidateStore()
+    with SessionLocal() as db:
+        candidate_store.load(db)
+    monkeypatch.setattr("takehome.repository.database_utils.candidate_store", candidate_store)
+
+    def stored(candidate_id):
+        candidates, _ = candidate_store.get_many([candidate_id])
+        return [(candidate.name, [(skill.name, skill.expertise_level) for skill in candidate.skills])
+                for candidate in candidates]
+
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    candidate = {"name": "Stored Candidate", "skills": [{"name": "Go", "expertise_level": 4}]}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        candidate_id = (await ac.post("/candidate/", json=candidate, headers=headers)).json()['id']
+        assert stored(candidate_id) == [("Stored Candidate", [("Go", 4)])]
+
+        candidate = {"id": candidate_id, "name": "Renamed Stored Candidate", "skills": [{"name": "Rust", "expertise_level": 6}]}
+        assert (await ac.put("/candidate/", json=candidate, headers=headers)).status_code == 200
+        assert stored(candidate_id) == [("Renamed Stored Candidate", [("Rust", 6)])]
+
+        items = [{"id": candidate_id, "upsert": [{"name": "Zig", "expertise_level": 2}], "remove": ["Rust"]}]
+        assert (await ac.patch("/candidates/skills", json={"items": items}, headers=headers)).status_code == 200
+        assert stored(candidate_id) == [("Renamed Stored Candidate", [("Zig", 2)])]
+
+        assert (await ac.delete("/candidate/", params={"id": candidate_id}, headers=headers)).status_code == 200
+    assert stored(candidate_id) == []
+    assert candidate_store.get_many([candidate_id]) == ([], [candidate_id])
+
+@pytest.mark.asyncio
+async def test_export_candidates_scorer_unavailable(login_token, monkeypatch):
+    headers = {"Authorization": f"Bearer {await login_token}"}
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        unscored_id = (await ac.post("/candidate/", json={"name": "Unscored Export", "skills": [{"name": "Go", "expertise_level": 4}]},
+                                     headers=headers)).json()['id']
+        await ac.post("/candidate/", json={"name": "Scored Export", "skills": [{"name": "Go", "expertise_level": 5}]}, headers=headers)
+
+        def fetch_special_score(payload):
+            if int(payload['candidate_id']) == unscored_id:
+                raise ScorerUnavailableError("scorer down")
+            return {skill['skill']: skill['score'] / 2 for skill in payload['skills']}
+        monkeypatch.setattr("takehome.utils.fetch_special_score", fetch_special_score)
+        monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 1)
+        response = await ac.get("/candidates/export", headers=headers)
+    assert response.status_code == 200
+    # the failure does not cut the stream short
+    candidates = {candidate['name']: candidate for candidate in map(json.loads, response.text.splitlines())}
+    assert candidates["Unscored Export"]['score_status'] == "pending"
+    assert candidates["Unscored Export"]['skills'] == [{"name": "Go", "expertise_level": 4, "special_score": None}]
+    assert candidates["Scored Export"]['score_status'] == "ready"
 
 """
 
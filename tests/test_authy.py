@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+import jwt
+import pytest
+from fastapi import HTTPException
+
+from takehome.authy import create_access_token, get_current_user, verified_tokens
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_caches_verified_token(monkeypatch):
+    token = create_access_token(data={"sub": "cached"}, expires_delta=timedelta(minutes=5))
+    assert (await get_current_user(token)).username == "cached"
+
+    def decode(*args, **kwargs):
+        raise AssertionError("a cached token is not decoded again")
+    monkeypatch.setattr(jwt, "decode", decode)
+    assert (await get_current_user(token)).username == "cached"
+
+@pytest.mark.asyncio
+async def test_get_current_user_rejects_expired_token():
+    verified_tokens.clear()
+    token = create_access_token(data={"sub": "expired"}, expires_delta=timedelta(seconds=-1))
+    with pytest.raises(HTTPException) as error:
+        await get_current_user(token)
+    assert error.value.status_code == 401
@@ -0,0 +1,44 @@
+import pytest
+
+from takehome.bulk_import import run_import
+from takehome.models import ProjectCreateRequest
+
+
+async def import_csv(content: bytes, chunk_size: int = 2):
+    inserted_rows = []
+
+    async def body():
+        # split mid record, rows are parsed as the body arrives
+        for i in range(0, len(content), 7):
+            yield content[i:i + 7]
+
+    async def insert_chunk(db, chunk):
+        inserted_rows.extend(chunk)
+        return len(chunk), []
+
+    response = await run_import(body(), "text/csv", None, ProjectCreateRequest, "title", insert_chunk, chunk_size)
+    return response, inserted_rows
+
+@pytest.mark.asyncio
+async def test_import_csv_quoted_fields_span_lines():
+    content = (b'title,skills\n'
+               b'"Multi\nline project","Python:7;\nSQL:5"\n'
+               b'\n'
+               b'Broken,Python:x\n'
+               b'"Quoted, ""title""",Go:3\r\n')
+    response, rows = await import_csv(content)
+    assert response.inserted == 2
+    assert [(error.line, error.error.split(":")[0]) for error in response.errors] == [(6, "skills.0.expertise_level")]
+    assert [(line, row.title) for line, row in rows] == [(2, "Multi\nline project"), (7, 'Quoted, "title"')]
+    assert [(skill.name, skill.expertise_level) for skill in rows[0][1].skills] == [("Python", 7), ("SQL", 5)]
+
+@pytest.mark.asyncio
+async def test_import_csv_errors():
+    response, rows = await import_csv(b'title,skills\nFirst,\n\xff,Go:3\n"Unterminated,Go:3\nnext line\n')
+    assert [(line, row.title) for line, row in rows] == [(2, "First")]
+    assert [error.line for error in response.errors] == [3, 4]
+    assert response.errors[1].error == "unterminated quoted field"
+
+    response, rows = await import_csv(b'name,level\nFirst,\n')
+    assert rows == []
+    assert [(error.line, error.error) for error in response.errors] == [(1, "CSV header must contain title and skills columns")]
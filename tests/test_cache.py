@@ -0,0 +1,127 @@
+import fnmatch
+import time
+
+import pytest
+
+from takehome.cache import CacheBackend, InMemoryCache, RedisCache, SQLiteCache
+
+
+class FakeRedis:
+    """
+    The redis commands used by RedisCache, on a dict, published messages are kept in `messages`
+    """
+    def __init__(self):
+        self.store = {}
+        self.messages = []
+
+    def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def scan_iter(self, match, count):
+        return [key for key in list(self.store) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+
+    def pipeline(self, transaction):
+        return FakePipeline(self)
+
+    def publish(self, channel, message):
+        self.messages.append((channel, message))
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        self.commands.append((key, value))
+
+    def execute(self):
+        for key, value in self.commands:
+            self.redis.set(key, value)
+
+
+def test_in_memory_cache_get_set():
+    cache = InMemoryCache(max_size=10, ttl=60)
+    cache.set("key", b"value")
+    assert cache.get("key") == b"value"
+    assert cache.get("missing") is None
+
+def test_in_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(max_size=2, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.get("a")
+    cache.set("c", b"3")
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+
+def test_in_memory_cache_expiry():
+    cache = InMemoryCache(max_size=10, ttl=60)
+    cache.set("key", b"value", ex=0)
+    time.sleep(0.01)
+    assert cache.get("key") is None
+
+def test_in_memory_cache_delete():
+    cache = InMemoryCache(max_size=10, ttl=60)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+    cache.delete("a", "b")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+def test_sqlite_cache_batch_get_set(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    cache.set_many({"a": b"1", "b": "2"}, ex=60)
+    assert cache.get_many(["a", "missing", "b"]) == [b"1", None, b"2"]
+    cache.delete("a")
+    assert cache.get("a") is None
+
+def test_sqlite_cache_expiry(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"))
+    cache.set("key", b"value", ex=0)
+    assert cache.get("key") is None
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+def test_redis_cache_clear_keeps_other_keys():
+    cache = RedisCache("redis://unused", InMemoryCache(max_size=10, ttl=60), "channel", "cache:")
+    cache._redis = FakeRedis()
+    cache.CLEAR_BATCH_SIZE = 2
+    cache._redis.set("session:1", b"kept")
+    for key in ("a", "b", "c"):
+        cache.set(key, b"1")
+    assert cache._redis.get("cache:a") == b"1"
+
+    cache.clear()
+    assert cache._redis.store == {"session:1": b"kept"}
+    assert cache.get("a") is None
+
+def test_redis_cache_broadcast_set_many_evicts_other_instances():
+    shared_redis = FakeRedis()
+    writer = RedisCache("redis://unused", InMemoryCache(max_size=10, ttl=60), "channel", "cache:")
+    reader = RedisCache("redis://unused", InMemoryCache(max_size=10, ttl=60), "channel", "cache:")
+    writer._redis = reader._redis = shared_redis
+    reader.set_many({"a": b"old", "b": b"old"})
+    assert shared_redis.messages == []
+
+    writer.set_many({"a": b"new"}, broadcast=True)
+    assert reader.get("a") == b"old"
+    for channel, message in shared_redis.messages:
+        assert channel == "channel"
+        writer._handle_invalidation({"data": message})
+        reader._handle_invalidation({"data": message})
+    assert writer.get("a") == b"new"
+    assert reader.get("a") == b"new"
+    assert reader.get("b") == b"old"
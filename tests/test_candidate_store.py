@@ -0,0 +1,64 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from takehome.candidate_store import CandidateStore, StoredCandidate, StoredSkill
+from takehome.repository.database import Base
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB, SkillDB
+
+
+def test_candidate_store_load():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add_all([SkillDB(id=1, name="Python"), SkillDB(id=2, name="SQL")])
+        db.add_all([CandidateDB(id=1, name="Alice"), CandidateDB(id=2, name="Bob"), CandidateDB(id=3, name="Carol")])
+        db.add_all([CandidateSkillDB(candidate_id=1, skill_id=1, expertise_level=7),
+                    CandidateSkillDB(candidate_id=1, skill_id=2, expertise_level=5),
+                    CandidateSkillDB(candidate_id=3, skill_id=2, expertise_level=9),
+                    CandidateSkillDB(candidate_id=3, skill_id=1, expertise_level=4)])
+        db.commit()
+
+        store = CandidateStore()
+        store.load(db)
+
+    candidates, missing_ids = store.get_many([3, 2, 1, 4])
+    assert missing_ids == [4]
+    assert candidates == [
+        # skills keep the order they were added in, not the order of the skill ids
+        StoredCandidate(3, "Carol", [StoredSkill(2, "SQL", 9), StoredSkill(1, "Python", 4)]),
+        StoredCandidate(2, "Bob", []),
+        StoredCandidate(1, "Alice", [StoredSkill(1, "Python", 7), StoredSkill(2, "SQL", 5)]),
+    ]
+
+def test_candidate_store_put_and_remove():
+    store = CandidateStore()
+    store.put(1, 1, "Alice", [(1, "Python", 7)])
+    assert store.get_many([1]) == ([], [1])
+
+    store.loaded = True
+    store.put(1, 1, "Alice", [(1, "Python", 7)])
+    store.put(2, 2, "Bob", [(2, "SQL", 5)])
+    store.put(1, 3, "Alice", [(1, "Python", 6), (2, "SQL", 3)])
+    store.remove(2, 4)
+    # more than half of the skill rows are deleted now, which compacts the arrays
+    store.put(1, 5, "Alice", [(1, "Python", 8), (2, "SQL", 3)])
+
+    assert len(store) == 1
+    assert len(store._candidate_ids) == 2
+    assert store.get_many([1, 2]) == ([StoredCandidate(1, "Alice", [StoredSkill(1, "Python", 8), StoredSkill(2, "SQL", 3)])], [2])
+
+def test_candidate_store_ignores_older_versions():
+    store = CandidateStore()
+    store.loaded = True
+    store.put(1, 3, "Alice", [(1, "Python", 8)])
+    # writes committed earlier but applied later
+    store.put(1, 2, "Alice", [(1, "Python", 5)])
+    store.remove(1, 1)
+    assert store.get_many([1]) == ([StoredCandidate(1, "Alice", [StoredSkill(1, "Python", 8)])], [])
+
+    store.remove(2, 5)
+    store.put(2, 4, "Bob", [(2, "SQL", 5)])
+    assert store.get_many([2]) == ([], [2])
+    # a candidate reusing the id of a deleted one is written at a higher version
+    store.put(2, 6, "Carol", [(2, "SQL", 9)])
+    assert store.get_many([2]) == ([StoredCandidate(2, "Carol", [StoredSkill(2, "SQL", 9)])], [])
@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
+
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB
+from takehome.repository.database_utils import _raise_conflict
+
+
+class RollbackSession:
+    def __init__(self):
+        self.rolled_back = False
+
+    async def rollback(self):
+        self.rolled_back = True
+
+def integrity_error(message: str) -> IntegrityError:
+    return IntegrityError("INSERT", {}, sqlite3.IntegrityError(message))
+
+async def raise_candidate_conflict(message: str):
+    db = RollbackSession()
+    try:
+        await _raise_conflict(db, integrity_error(message), CandidateDB.__table__.c.name, CandidateSkillDB,
+                              "Invalid Request, candidate already exists")
+    finally:
+        assert db.rolled_back
+
+@pytest.mark.asyncio
+async def test_raise_conflict_on_key_column():
+    with pytest.raises(HTTPException) as error:
+        await raise_candidate_conflict("UNIQUE constraint failed: candidates.name")
+    assert error.value.detail == "Invalid Request, candidate already exists"
+
+@pytest.mark.asyncio
+async def test_raise_conflict_on_repeated_skill():
+    with pytest.raises(HTTPException) as error:
+        await raise_candidate_conflict("UNIQUE constraint failed: candidate_skills.candidate_id, candidate_skills.skill_id")
+    assert error.value.detail == "Invalid Request, skill names must be unique"
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("message", [
+    "NOT NULL constraint failed: candidate_skills.skill_id",
+    "FOREIGN KEY constraint failed",
+    "UNIQUE constraint failed: skills.name",
+])
+async def test_raise_conflict_reraises_other_errors(message):
+    with pytest.raises(IntegrityError):
+        await raise_candidate_conflict(message)
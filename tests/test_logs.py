@@ -0,0 +1,39 @@
+import io
+import json
+import logging
+from logging.handlers import QueueHandler
+
+from takehome.logs import LOGGER, console_handler, start_logging, stop_logging
+
+
+def test_record_is_written_once_by_the_listener():
+    stream = io.StringIO()
+    previous_stream = console_handler.setStream(stream)
+    try:
+        LOGGER.warning("Queued %s record", "warning", extra={"source": "test_logs"})
+        # stopping the listener writes every queued record
+        stop_logging()
+    finally:
+        console_handler.setStream(previous_stream)
+        start_logging()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    records = [record for record in records if record.get("source") == "test_logs"]
+    assert len(records) == 1
+    assert records[0]["message"] == "Queued warning record"
+    assert records[0]["level"] == "WARNING"
+    assert records[0]["emission_timestamp"].endswith("Z")
+    assert LOGGER.handlers == []
+
+def test_queue_handler_leaves_message_arguments_to_the_listener():
+    class Argument:
+        def __str__(self):
+            formatted.append(True)
+            return "argument"
+
+    formatted = []
+    [queue_handler] = [handler for handler in logging.getLogger().handlers if isinstance(handler, QueueHandler)]
+    record = LOGGER.makeRecord(LOGGER.name, logging.WARNING, __file__, 0, "Deferred %s", (Argument(),), None)
+    assert queue_handler.prepare(record) is record
+    assert formatted == []
+    assert json.loads(console_handler.format(record))["message"] == "Deferred argument"
@@ -0,0 +1,130 @@
+import pytest
+from sqlalchemy import create_engine, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, selectinload
+
+from takehome import app as app_module
+from takehome.repository.database import Base
+from takehome.models import Candidate, Skill
+from takehome.repository.database_models import CandidateDB, ProjectDB
+from takehome.repository.database_utils import get_row_version, update_candidate_db
+from takehome.repository.migrations import MIGRATIONS, run_migrations
+from takehome.repository.migrations import _add_candidate_skill_special_score, _add_row_versions
+from takehome.responses import row_etag
+
+# tables as created by the models before any migration
+BASELINE_SCHEMA = [
+    "CREATE TABLE projects (id INTEGER NOT NULL PRIMARY KEY, title VARCHAR NOT NULL)",
+    "CREATE TABLE candidates (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR NOT NULL)",
+    "CREATE TABLE candidate_skills (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, expertise_level INTEGER, "
+    "candidate_id INTEGER REFERENCES candidates (id))",
+    "CREATE TABLE project_skills (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, expertise_level INTEGER, "
+    "project_id INTEGER REFERENCES projects (id))",
+    "INSERT INTO projects (id, title) VALUES (1, 'Website')",
+    "INSERT INTO candidates (id, name) VALUES (1, 'Alice')",
+    "INSERT INTO candidate_skills (id, name, expertise_level, candidate_id) VALUES (1, 'Python', 7, 1)",
+    "INSERT INTO project_skills (id, name, expertise_level, project_id) VALUES (1, 'Python', 6, 1)",
+]
+
+
+def baseline_engine(url: str = "sqlite://"):
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in BASELINE_SCHEMA:
+            connection.exec_driver_sql(statement)
+    return engine
+
+def column_names(connection, table):
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+def test_add_candidate_skill_special_score():
+    engine = baseline_engine()
+    with engine.begin() as connection:
+        _add_candidate_skill_special_score(connection)
+        # a second run is a no-op
+        _add_candidate_skill_special_score(connection)
+        assert {"version", "special_score", "special_score_version",
+                "special_score_fresh_until"} <= column_names(connection, "candidate_skills")
+        row = connection.exec_driver_sql(
+            "SELECT version, special_score, special_score_version, special_score_fresh_until FROM candidate_skills").one()
+    assert tuple(row) == (1, None, None, None)
+
+def test_add_row_versions():
+    engine = baseline_engine()
+    with engine.begin() as connection:
+        _add_row_versions(connection)
+        _add_row_versions(connection)
+        assert connection.exec_driver_sql("SELECT version FROM candidates").scalar() == 1
+        assert connection.exec_driver_sql("SELECT version FROM projects").scalar() == 1
+        # the table versions start at the row versions so the next write stamps a new version
+        assert connection.exec_driver_sql("SELECT name, version FROM collection_versions ORDER BY name").all() == [
+            ("candidates", 1), ("projects", 1)]
+
+def start(engine):
+    """
+    Schema setup of the app startup
+    """
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+def schema_version(engine) -> int:
+    with engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+def test_migrations_on_fresh_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    start(engine)
+    assert schema_version(engine) == len(MIGRATIONS)
+    # a restart applies nothing
+    start(engine)
+    assert schema_version(engine) == len(MIGRATIONS)
+
+def test_migrations_on_baseline_database(tmp_path):
+    engine = baseline_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    start(engine)
+    assert schema_version(engine) == len(MIGRATIONS)
+    with engine.connect() as connection:
+        assert "name" not in column_names(connection, "candidate_skills")
+        assert connection.exec_driver_sql(
+            "SELECT rowid FROM candidates_fts WHERE candidates_fts MATCH 'ali*'").scalar() == 1
+    with Session(engine) as db:
+        candidate = db.scalars(select(CandidateDB).options(selectinload(CandidateDB.skills))).one()
+        project = db.scalars(select(ProjectDB).options(selectinload(ProjectDB.skills))).one()
+        assert [(skill.name, skill.expertise_level) for skill in candidate.skills] == [("Python", 7)]
+        assert [(skill.name, skill.expertise_level) for skill in project.skills] == [("Python", 6)]
+        assert candidate.version == 1
+
+def test_failed_migration_rolls_back(tmp_path):
+    engine = baseline_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as connection:
+        # violates the unique index added by _add_hot_path_indexes, after a column was added by the first migration
+        connection.exec_driver_sql("INSERT INTO candidates (id, name) VALUES (2, 'Alice')")
+    with pytest.raises(IntegrityError):
+        start(engine)
+    assert schema_version(engine) == 0
+    with engine.connect() as connection:
+        assert "special_score" not in column_names(connection, "candidate_skills")
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DELETE FROM candidates WHERE id = 2")
+    start(engine)
+    assert schema_version(engine) == len(MIGRATIONS)
+
+@pytest.mark.asyncio
+async def test_update_after_row_versions_migration(tmp_path):
+    path = tmp_path / "baseline.db"
+    start(baseline_engine(f"sqlite:///{path}"))
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with AsyncSession(async_engine, expire_on_commit=False) as db:
+        etag = row_etag("candidate", 1, await get_row_version(db, CandidateDB, 1))
+        await update_candidate_db(db, Candidate(id=1, name="Alice", skills=[Skill(name="Python", expertise_level=8)]))
+        assert row_etag("candidate", 1, await get_row_version(db, CandidateDB, 1)) != etag
+    await async_engine.dispose()
+
+def test_startup_event_on_fresh_database(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    monkeypatch.setattr(app_module, "engine", engine)
+    app_module.startup_event()
+    app_module.shutdown_event()
+    assert schema_version(engine) == len(MIGRATIONS)
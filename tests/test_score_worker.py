@@ -0,0 +1,36 @@
+import threading
+import time
+
+from takehome.score_worker import ScoreWarmer
+
+
+def test_score_warmer_drops_when_queue_full():
+    warmer = ScoreWarmer(concurrency=1, max_queue_size=1)
+    assert warmer.enqueue({"candidate_id": "1", "skills": [{"skill": "Python", "score": 7}]}) is True
+    assert warmer.enqueue({"candidate_id": "2", "skills": [{"skill": "SQL", "score": 5}]}) is False
+
+def test_score_warmer_deduplicates_pending_skills():
+    warmer = ScoreWarmer(concurrency=1, max_queue_size=10)
+    assert warmer.enqueue({"candidate_id": "1", "skills": [{"skill": "Python", "score": 7}]}) is True
+    assert warmer.enqueue({"candidate_id": "2", "skills": [{"skill": "Python", "score": 7}]}) is False
+    assert warmer.enqueue({"candidate_id": "2", "skills": [{"skill": "Python", "score": 7}]}, refresh=True) is True
+
+def test_score_warmer_stops_with_a_full_queue(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr("takehome.score_worker.fetch_special_score", lambda payload, refresh: release.wait(5))
+    warmer = ScoreWarmer(concurrency=1, max_queue_size=1)
+    warmer.start()
+    assert warmer.enqueue({"candidate_id": "1", "skills": [{"skill": "Python", "score": 7}]}) is True
+    # the worker is busy with the first payload, the second one fills the queue
+    while not warmer.queue.empty():
+        time.sleep(0.01)
+    assert warmer.enqueue({"candidate_id": "2", "skills": [{"skill": "SQL", "score": 5}]}) is True
+
+    worker = warmer._threads[0]
+    started = time.monotonic()
+    warmer.stop(timeout=0.1)
+    assert time.monotonic() - started < 1
+    # the queued payload is dropped and the worker returns once its scorer call is done
+    release.set()
+    worker.join(1)
+    assert not worker.is_alive()
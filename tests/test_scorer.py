@@ -0,0 +1,41 @@
+import time
+
+from takehome.scorer import CircuitBreaker, TokenBucket
+
+
+def test_circuit_breaker_opens_on_failure_rate():
+    breaker = CircuitBreaker(window_size=4, min_calls=4, failure_rate=0.5, reset_timeout=60)
+    breaker.record_success()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow_request() is True
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.allow_request() is False
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(window_size=2, min_calls=1, failure_rate=0.5, reset_timeout=0.01)
+    breaker.record_failure()
+    assert breaker.allow_request() is False
+    time.sleep(0.02)
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() is True
+
+def test_circuit_breaker_reopens_on_failed_trial():
+    breaker = CircuitBreaker(window_size=2, min_calls=1, failure_rate=0.5, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.allow_request() is True
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=2)
+    start = time.monotonic()
+    for _ in range(4):
+        bucket.acquire()
+    # two burst tokens are free, the next two wait 10ms each
+    assert time.monotonic() - start >= 0.015
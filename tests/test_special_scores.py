@@ -0,0 +1,111 @@
+import json
+import time
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from takehome.cache import InMemoryCache, RedisCache
+from takehome.repository.database import Base
+from takehome.repository.database_models import CandidateDB, CandidateSkillDB, SkillDB
+from takehome.repository.database_utils import get_stored_special_scores, save_special_scores_db
+from takehome.utils import fetch_special_score, special_score_key
+from tests.test_cache import FakeRedis
+
+PAYLOAD = {"candidate_id": "1", "skills": [{"skill": "Python", "score": 7}]}
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        db.add(SkillDB(id=1, name="Python"))
+        db.add(CandidateDB(id=1, name="Alice"))
+        db.add(CandidateSkillDB(id=1, candidate_id=1, skill_id=1, expertise_level=7))
+        db.commit()
+    return engine
+
+@pytest.fixture
+def scorer(engine, monkeypatch):
+    """
+    Runs fetch_special_score on `engine` with an empty cache, records the scorer calls and the refreshes
+    """
+    calls = {"scorer": [], "refresh": []}
+
+    @contextmanager
+    def get_db():
+        with Session(engine) as db:
+            yield db
+
+    def request_special_scores(payload):
+        calls["scorer"].append(payload)
+        return [0.5 for _ in payload["skills"]]
+
+    monkeypatch.setattr("takehome.utils.get_db", get_db)
+    monkeypatch.setattr("takehome.utils.score_cache", InMemoryCache(max_size=10, ttl=60))
+    monkeypatch.setattr("takehome.utils.request_special_scores", request_special_scores)
+    monkeypatch.setattr("takehome.utils._schedule_refresh", calls["refresh"].append)
+    return calls
+
+def test_save_special_scores_db_stamps_the_skill_version(engine):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 7): 0.5}, 100.0)
+        assert get_stored_special_scores(db, 1) == {("Python", 7): (0.5, 100.0)}
+        assert db.get(CandidateSkillDB, 1).special_score_version == 1
+
+def test_save_special_scores_db_skips_changed_expertise_level(engine):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 8): 0.5}, 100.0)
+        assert get_stored_special_scores(db, 1) == {}
+        assert db.get(CandidateSkillDB, 1).special_score is None
+
+def test_stored_special_score_is_invalid_after_a_version_change(engine):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 7): 0.5}, 100.0)
+        db.get(CandidateSkillDB, 1).version += 1
+        db.commit()
+        assert get_stored_special_scores(db, 1) == {}
+
+def test_fetch_special_score_persists_fetched_scores(engine, scorer):
+    assert fetch_special_score(PAYLOAD) == {"Python": 0.5}
+    assert len(scorer["scorer"]) == 1
+    with Session(engine) as db:
+        score, fresh_until = get_stored_special_scores(db, 1)[("Python", 7)]
+    assert score == 0.5
+    assert fresh_until > time.time()
+
+def test_fetch_special_score_reads_fresh_stored_scores(engine, scorer):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 7): 0.25}, time.time() + 60)
+    assert fetch_special_score(PAYLOAD) == {"Python": 0.25}
+    assert scorer == {"scorer": [], "refresh": []}
+
+def test_fetch_special_score_refreshes_stale_stored_scores(engine, scorer):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 7): 0.25}, time.time() - 1)
+    # a stale score is served while its refresh is queued
+    assert fetch_special_score(PAYLOAD) == {"Python": 0.25}
+    assert scorer["scorer"] == []
+    assert scorer["refresh"] == [PAYLOAD]
+
+def test_fetch_special_score_ignores_scores_of_an_older_version(engine, scorer):
+    with Session(engine) as db:
+        save_special_scores_db(db, 1, {("Python", 7): 0.25}, time.time() + 60)
+        db.get(CandidateSkillDB, 1).version += 1
+        db.commit()
+    assert fetch_special_score(PAYLOAD) == {"Python": 0.5}
+    assert len(scorer["scorer"]) == 1
+
+def test_fetch_special_score_refresh_evicts_other_instances(scorer, monkeypatch):
+    cache = RedisCache("redis://unused", InMemoryCache(max_size=10, ttl=60), "channel", "cache:")
+    cache._redis = FakeRedis()
+    monkeypatch.setattr("takehome.utils.score_cache", cache)
+    fetch_special_score(PAYLOAD)
+    assert cache._redis.messages == []
+
+    fetch_special_score(PAYLOAD, refresh=True)
+    [(channel, message)] = cache._redis.messages
+    assert channel == "channel"
+    assert json.loads(message)["keys"] == [special_score_key("Python", 7)]
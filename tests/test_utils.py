@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from takehome.config import settings
+from takehome.logs import LOGGER
+from takehome.utils import fetch_scores_with_deadline
+
+
+@pytest.fixture
+def scorer_calls(monkeypatch):
+    """
+    Replaces the scorer executor with futures resolved by the test, in submission order
+    """
+    calls = []
+
+    def submit_special_score(payload):
+        future = asyncio.get_running_loop().create_future()
+        calls.append((payload['candidate_id'], future))
+        return future
+
+    monkeypatch.setattr("takehome.utils.submit_special_score", submit_special_score)
+    monkeypatch.setattr(settings, "SCORER_MAX_PENDING_PER_REQUEST", 2)
+    return calls
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+@pytest.mark.asyncio
+async def test_fetch_scores_with_deadline_caps_pending_calls(scorer_calls):
+    payloads = [{'candidate_id': str(candidate_id), 'skills': []} for candidate_id in range(5)]
+    special_scores = await fetch_scores_with_deadline(payloads, 0.01)
+    assert special_scores == {str(candidate_id): None for candidate_id in range(5)}
+    assert len(scorer_calls) == 2
+
+    # the rest is submitted in the background as earlier calls finish
+    for index in range(5):
+        scorer_calls[index][1].set_result({})
+        await settle()
+        assert len(scorer_calls) == min(index + 3, 5)
+
+@pytest.mark.asyncio
+async def test_fetch_scores_with_deadline_returns_ready_scores(scorer_calls):
+    payloads = [{'candidate_id': "1", 'skills': []}, {'candidate_id': "2", 'skills': []}]
+    scores_task = asyncio.ensure_future(fetch_scores_with_deadline(payloads, 0.05))
+    await settle()
+    scorer_calls[0][1].set_result({"Go": 1.5})
+    assert await scores_task == {"1": {"Go": 1.5}, "2": None}
+    scorer_calls[1][1].set_result({})
+    await settle()
+
+@pytest.mark.asyncio
+async def test_fetch_scores_with_deadline_logs_abandoned_failures(scorer_calls, monkeypatch):
+    warnings = []
+    monkeypatch.setattr(LOGGER, "warn", lambda message, *args: warnings.append(args))
+    payloads = [{'candidate_id': str(candidate_id), 'skills': []} for candidate_id in range(3)]
+    await fetch_scores_with_deadline(payloads, 0.01)
+
+    error = RuntimeError("scorer down")
+    scorer_calls[0][1].set_exception(error)
+    await settle()
+    # the failure ends the background fetch, the call still running is consumed once it fails too
+    scorer_calls[1][1].set_exception(error)
+    await settle()
+    assert len(scorer_calls) == 2
+    assert warnings == [(error,), (error,)]